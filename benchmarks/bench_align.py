@@ -0,0 +1,108 @@
+"""
+Benchmark align_verses_for_merge against the original per-verse loop at
+1x (one 50-chapter book), 10x and full-Bible (1189 chapters) scale, and
+check that both produce the same frames.
+
+Run from anywhere: python benchmarks/bench_align.py [--legacy-max-chapters N]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from fixtures import make_verses
+from parallel_corpus import align_verses_for_merge, consolidate_verses
+
+SCALES = [("1x", 50), ("10x", 500), ("full Bible", 1189)]
+
+
+def legacy_merge_ranges(ranges, aligned):
+    """
+    The original per-range loop: one boolean mask over the whole frame per
+    verse and one pd.concat per range.
+    """
+    for (book, chapter, verse_range), verse_nums in ranges.items():
+        text_col = aligned.columns[-1]
+        texts = []
+        verses_to_remove = []
+
+        for v in verse_nums:
+            matching_verse = aligned[
+                (aligned['Book'] == book) &
+                (aligned['Chapter'] == chapter) &
+                (aligned['Verse'] == str(v))
+            ]
+            if len(matching_verse) > 0:
+                text = str(matching_verse[text_col].iloc[0])
+                if text and text.lower() not in ['nan', 'none', '']:
+                    texts.append(text.strip())
+                else:
+                    texts.append('<missing verse>')
+                verses_to_remove.append(str(v))
+            else:
+                texts.append('<missing verse>')
+
+        if verses_to_remove:
+            aligned = aligned[~(
+                (aligned['Book'] == book) &
+                (aligned['Chapter'] == chapter) &
+                (aligned['Verse'].astype(str).isin(verses_to_remove))
+            )]
+            new_row = {
+                'Book': book,
+                'Chapter': chapter,
+                'Verse': verse_range,
+                text_col: ' '.join(texts),
+            }
+            aligned = pd.concat([aligned, pd.DataFrame([new_row])], ignore_index=True)
+    return aligned
+
+
+def legacy_align_verses_for_merge(df1, df2):
+    ranges1 = consolidate_verses(df1)
+    ranges2 = consolidate_verses(df2)
+    df2_aligned = legacy_merge_ranges(ranges1, df2.copy())
+    df1_aligned = legacy_merge_ranges(ranges2, df1.copy())
+    return df1_aligned, df2_aligned
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--legacy-max-chapters",
+        type=int,
+        default=500,
+        help="skip the (quadratic) legacy loop above this many chapters",
+    )
+    args = parser.parse_args()
+
+    for name, chapters in SCALES:
+        df1 = make_verses(chapters, seed=1)
+        df2 = make_verses(chapters, seed=2)
+        new, new_time = timed(align_verses_for_merge, df1, df2)
+        line = f"{name:<11} {len(df1):>6} verses | vectorized {new_time:8.3f}s"
+
+        if chapters <= args.legacy_max_chapters:
+            old, old_time = timed(legacy_align_verses_for_merge, df1, df2)
+            assert_frame_equal(old[0], new[0])
+            assert_frame_equal(old[1], new[1])
+            line += f" | legacy {old_time:8.3f}s | {old_time / new_time:6.1f}x, outputs equal"
+        else:
+            line += " | legacy skipped"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Micro-benchmark: per-file cost of the verse/sentence rules, comparing the
+old compile-every-call apply_rules against the precompiled RulePipeline.
+
+Run from anywhere: python benchmarks/bench_rules.py
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)  # data_cleaning loads book-names.tsv relative to the cwd
+
+import pcre2
+
+import data_cleaning as dc
+from fixtures import make_page
+
+# The page make_page() builds by default
+VERSES = 30
+PADDING = 200_000
+
+
+def legacy_apply_rules(text, rules):
+    for pattern_str, repl in rules:
+        pattern = pcre2.compile(pattern_str, pcre2.MULTILINE)
+        text = pattern.sub(repl, text)
+    return text.strip()
+
+
+REPEAT = 5  # timed trials per version; the best one counts
+MIN_TRIAL_SECONDS = 0.5
+
+
+def bench(fn, text, rules):
+    """
+    Seconds per call over one trial of at least MIN_TRIAL_SECONDS.
+    """
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        fn(text, rules)
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_TRIAL_SECONDS:
+            return elapsed / calls
+
+
+def main(repeat=REPEAT, verses=VERSES, padding=PADDING):
+    page = make_page(verses, padding=padding)
+    print(
+        f"Page: {verses} verses, padding {padding} ({len(page)} chars); "
+        f"best of {repeat} trials of >= {MIN_TRIAL_SECONDS}s each"
+    )
+
+    for name, rules, pipeline in [
+        ("verses", dc.VERSE_RULES, dc.VERSE_PIPELINE),
+        ("sentences", dc.SENTENCE_RULES, dc.SENTENCE_PIPELINE),
+    ]:
+        expected = legacy_apply_rules(page, rules)
+        if dc.apply_rules(page, pipeline) != expected:
+            raise SystemExit(f"{name}: pipeline output differs from the legacy rules")
+
+        # Trials alternate between the two versions so drift in machine
+        # load affects both alike
+        legacy = compiled = float("inf")
+        for _ in range(repeat):
+            legacy = min(legacy, bench(legacy_apply_rules, page, rules))
+            compiled = min(compiled, bench(dc.apply_rules, page, pipeline))
+        print(
+            f"{name:<10} legacy {legacy * 1000:7.3f} ms/file | "
+            f"pipeline {compiled * 1000:7.3f} ms/file | "
+            f"{legacy / compiled:4.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--verses", type=int, default=VERSES, help="verses on the synthetic page")
+    parser.add_argument("--padding", type=int, default=PADDING, help="filler markup around the chapter, see fixtures.make_page")
+    args = parser.parse_args()
+    main(args.repeat, args.verses, args.padding)
@@ -0,0 +1,129 @@
+"""
+Synthetic inputs for the benchmarks: chapter pages with bible.com's verse
+markup, Original-Text trees built from them and Verses-shaped frames.
+Everything is generated from a seed, so runs are repeatable and need no
+network.
+"""
+import random
+from pathlib import Path
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+
+WORDS = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor".split()
+LANGUAGES = [
+    ("English", "NIV"),
+    ("Cebuano", "ABCEB"),
+    ("Bikolano", "MBBBIK92"),
+    ("Spanish", "NVI"),
+    ("Ilokano", "RIPV"),
+]
+VERSES_PER_CHAPTER = 26
+
+# Corpus sizes for the suite: books x languages x chapters pages of
+# verses_per_chapter verses each
+SCALES = {
+    "small": {"books": 2, "languages": 3, "chapters": 5, "verses_per_chapter": 25},
+    "medium": {"books": 5, "languages": 5, "chapters": 10, "verses_per_chapter": 30},
+    "large": {"books": 10, "languages": 5, "chapters": 25, "verses_per_chapter": 30},
+}
+
+
+def book_acronyms():
+    """
+    Book acronyms in book-names.tsv (canonical) order.
+    """
+    with open(ROOT / "book-names.tsv", encoding="utf-8") as f:
+        return [line.split("\t")[0] for line in f if "\t" in line]
+
+
+def make_sentence(rng):
+    words = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 12)))
+    return words.capitalize() + rng.choice([".", ".", "?", "!"])
+
+
+def make_chapter_body(verses, rng, range_rate=0.04, footnote_rate=0.2):
+    """
+    The chapter container: one verse span per label, some labels merged
+    into ranges such as "4-6", and footnotes (with their own "#" label)
+    between verse contents.
+    """
+    parts = ['<div class="ChapterContent_chapter__uvbXo">']
+    v = 1
+    while v <= verses:
+        if rng.random() < range_rate and v + 2 <= verses:
+            end = v + rng.randint(1, 2)
+            label = f"{v}-{end}"
+            v = end + 1
+        else:
+            label = str(v)
+            v += 1
+        parts.append(
+            '<span class="ChapterContent_verse__57FIw">'
+            f'<span class="ChapterContent_label__R2PLt">{label}</span>'
+        )
+        for _ in range(rng.randint(1, 3)):
+            parts.append(f'<span class="ChapterContent_content__RrUqA">{make_sentence(rng)} </span>')
+            if rng.random() < footnote_rate:
+                parts.append(
+                    '<span class="ChapterContent_note__YlDW0">'
+                    '<span class="ChapterContent_label__R2PLt">#</span>'
+                    f'<span class="ChapterContent_body__O3qjr">[{make_sentence(rng)}]</span></span>'
+                )
+        parts.append("</span>")
+    parts.append("</div>")
+    return "".join(parts)
+
+
+def make_page(verses=30, padding=200_000, seed=0, range_rate=0.04, footnote_rate=0.2):
+    """
+    A chapter page with bible.com's verse markup wrapped in script/markup
+    noise roughly the size of a real saved page.
+    """
+    rng = random.Random(seed)
+    noise = "<script>" + "window.__x = {a: 1};" * (padding // 40) + "</script>\n"
+    body = make_chapter_body(verses, rng, range_rate, footnote_rate)
+    return noise + body + "\n" + noise
+
+
+def write_corpus(root, books=2, languages=3, chapters=5, verses_per_chapter=25, padding=20_000, seed=0):
+    """
+    An Original-Text/{book}/{lang}/{book}.{chapter}.{version}.{lang}.html
+    tree under `root`, using real book acronyms so book names resolve.
+    Returns the written paths.
+    """
+    rng = random.Random(seed)
+    paths = []
+    for book in book_acronyms()[:books]:
+        for lang, version in LANGUAGES[:languages]:
+            lang_dir = Path(root) / book / lang
+            lang_dir.mkdir(parents=True, exist_ok=True)
+            for chapter in range(1, chapters + 1):
+                page = make_page(verses_per_chapter, padding, seed=rng.random())
+                path = lang_dir / f"{book}.{chapter}.{version}.{lang}.html"
+                path.write_text(page, encoding="utf-8")
+                paths.append(path)
+    return paths
+
+
+def make_verses(chapters, seed, range_rate=0.04):
+    """
+    A Verses/*.tsv-shaped frame (all columns str) where a few verses are
+    merged into ranges such as "4-6".
+    """
+    rng = random.Random(seed)
+    rows = []
+    for ch in range(1, chapters + 1):
+        book = f"Book{(ch - 1) // 50 + 1:02d}"
+        chapter = str((ch - 1) % 50 + 1)
+        v = 1
+        while v <= VERSES_PER_CHAPTER:
+            if rng.random() < range_rate and v + 2 <= VERSES_PER_CHAPTER:
+                end = v + rng.randint(1, 2)
+                rows.append([book, chapter, f"{v}-{end}", f"text {v}-{end}"])
+                v = end + 1
+            else:
+                rows.append([book, chapter, str(v), f"text {v}"])
+                v += 1
+    return pd.DataFrame(rows, columns=["Book", "Chapter", "Verse", "Text"])
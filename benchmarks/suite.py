@@ -0,0 +1,265 @@
+"""
+Benchmark suite over synthetic fixtures: rule application, per-file verse
+segmentation, full segmentation, verse-range alignment and the parallel
+corpus build. Reports throughput and peak Python memory (tracemalloc) and
+compares both against benchmarks/baselines.json.
+
+Runs offline and single-process, so tracemalloc sees every allocation.
+Baselines are machine-specific: record them with --update-baseline on the
+machine that will check for regressions.
+
+Run from anywhere: python benchmarks/suite.py [--scale medium] [--only align]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import socket
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)  # data_cleaning loads book-names.tsv relative to the cwd
+
+import data_cleaning as dc
+import fixtures
+import metrics
+from parallel_corpus import align_verses_for_merge, create_parallel_corpus
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baselines.json"
+TOLERANCE = 0.3  # slower / bigger than the baseline by more than this fails
+REPEAT = 3  # timed trials per benchmark; the best one counts
+MIN_TRIAL_SECONDS = 0.5
+MEMORY_SLACK_MB = 1.0  # peak memory growth always allowed, for tiny baselines
+
+
+def block_network():
+    """
+    Fail loudly if anything under benchmark tries to open a connection.
+    """
+
+    def refuse(*args, **kwargs):
+        raise RuntimeError("benchmarks must not use the network")
+
+    socket.socket.connect = refuse
+    socket.create_connection = refuse
+
+
+class Fixture:
+    """
+    Scale settings plus the synthetic Original-Text and Verses trees, built
+    on first use and shared by every benchmark in the run.
+    """
+
+    def __init__(self, scale, workdir):
+        self.scale = scale
+        self.settings = fixtures.SCALES[scale]
+        self.workdir = Path(workdir)
+        self._pages = None
+        self._verses = None
+
+    @property
+    def pages(self):
+        if self._pages is None:
+            self._pages = fixtures.write_corpus(self.workdir / "Original-Text", **self.settings)
+        return self._pages
+
+    @property
+    def verses_dir(self):
+        if self._verses is None:
+            self.pages
+            self._verses = self.workdir / "Verses"
+            quietly(dc.segment_verses, self.workdir / "Original-Text", self._verses, workers=1)
+        return self._verses
+
+    def output_dir(self, name):
+        return self.workdir / "out" / name
+
+
+def quietly(fn, *args, **kwargs):
+    # The pipeline prints a line per file; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+# Each benchmark does its setup untimed and returns (run, units, unit name):
+# run() is the timed part and processes `units` units.
+
+def bench_apply_rules(fixture):
+    pages = [fixtures.make_page(fixture.settings["verses_per_chapter"], seed=i) for i in range(20)]
+
+    def run():
+        for page in pages:
+            dc.apply_rules(page, dc.VERSE_PIPELINE)
+            dc.apply_rules(page, dc.SENTENCE_PIPELINE)
+
+    return run, len(pages), "pages"
+
+
+def bench_process_verse_file(fixture):
+    pages = fixture.pages
+
+    def run():
+        for path in pages:
+            dc.process_verse_file(path)
+
+    return run, len(pages), "files"
+
+
+def bench_segmentation(fixture):
+    source = fixture.workdir / "Original-Text"
+    pages = fixture.pages
+    out = fixture.output_dir("segmentation")
+
+    def run():
+        quietly(dc.segment_corpus, source, out / "Verses", out / "Sentences", workers=1)
+
+    return run, len(pages), "files"
+
+
+def bench_align(fixture):
+    chapters = fixture.settings["books"] * fixture.settings["chapters"] * 10
+    df1 = fixtures.make_verses(chapters, seed=1)
+    df2 = fixtures.make_verses(chapters, seed=2)
+
+    def run():
+        align_verses_for_merge(df1, df2)
+
+    return run, len(df1) + len(df2), "verses"
+
+
+def bench_parallel_corpus(fixture):
+    verses_dir = fixture.verses_dir
+    rows = sum(sum(1 for _ in open(path, encoding="utf-8")) - 1 for path in verses_dir.glob("*.tsv"))
+    out = fixture.output_dir("parallel")
+
+    def run():
+        quietly(create_parallel_corpus, verses_dir=verses_dir, output_dir=out, workers=1)
+
+    return run, rows, "verses"
+
+
+BENCHMARKS = {
+    "apply_rules": bench_apply_rules,
+    "process_verse_file": bench_process_verse_file,
+    "segmentation": bench_segmentation,
+    "align": bench_align,
+    "parallel_corpus": bench_parallel_corpus,
+}
+
+
+def measure(run, repeat):
+    """
+    Best seconds per run() over `repeat` trials, each looping run() for at
+    least MIN_TRIAL_SECONDS so small scales aren't lost in timer noise, and
+    the peak traced memory of one more run().
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        runs = 0
+        start = time.perf_counter()
+        while True:
+            run()
+            runs += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= MIN_TRIAL_SECONDS:
+                break
+        best = min(best, elapsed / runs)
+
+    # A separate run for memory: tracing slows everything down
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def compare(result, baseline, tolerance):
+    """
+    Regressions of one result against its baseline entry, as text.
+    """
+    problems = []
+    if result["throughput"] < baseline["throughput"] * (1 - tolerance):
+        problems.append(
+            f"throughput {result['throughput']:.1f} < baseline {baseline['throughput']:.1f} {result['unit']}/s"
+        )
+    if result["peak_mb"] > baseline["peak_mb"] * (1 + tolerance) + MEMORY_SLACK_MB:
+        problems.append(f"peak memory {result['peak_mb']:.1f} MB > baseline {baseline['peak_mb']:.1f} MB")
+    return problems
+
+
+def load_baselines(path):
+    if not Path(path).exists():
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baselines(path, baselines):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=sorted(fixtures.SCALES), default="small")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="run just these benchmarks")
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--update-baseline", action="store_true", help="store this run as the baseline")
+    args = parser.parse_args()
+
+    block_network()
+    metrics.METRICS_FORMAT = None  # keep the stages' metrics files out of the repo
+    baselines = load_baselines(args.baseline)
+    names = args.only or list(BENCHMARKS)
+    regressions = []
+
+    with tempfile.TemporaryDirectory() as workdir:
+        fixture = Fixture(args.scale, workdir)
+        print(f"Scale {args.scale}: {fixture.settings}")
+        for name in names:
+            run, units, unit = BENCHMARKS[name](fixture)
+            seconds, peak = measure(run, args.repeat)
+            key = f"{name}@{args.scale}"
+            result = {
+                "throughput": round(units / seconds, 2),
+                "unit": unit,
+                "peak_mb": round(peak / 1024 / 1024, 2),
+            }
+
+            line = (
+                f"{name:<20} {units:>7} {unit:<6} {seconds:8.3f}s "
+                f"{result['throughput']:>10.1f} {unit}/s  peak {result['peak_mb']:7.1f} MB"
+            )
+            if args.update_baseline:
+                baselines[key] = result
+            elif key in baselines:
+                problems = compare(result, baselines[key], args.tolerance)
+                line += "  REGRESSION: " + "; ".join(problems) if problems else "  ok"
+                regressions.extend(f"{key}: {p}" for p in problems)
+            else:
+                line += "  (no baseline)"
+            print(line)
+
+    if args.update_baseline:
+        save_baselines(args.baseline, baselines)
+        print(f"Baselines saved to {args.baseline}")
+    elif regressions:
+        print("\nRegressions against the baseline:")
+        for regression in regressions:
+            print(" ", regression)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
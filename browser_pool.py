@@ -0,0 +1,144 @@
+import asyncio
+import re
+from contextlib import asynccontextmanager
+
+POOL_SIZE = 4  # browser contexts (one page each) open at once
+MAX_NAVIGATIONS = 200  # a context is replaced after this many navigations
+MAX_HEAP_MB = 512  # ... or once its page's JS heap grows past this
+HEAP_CHECK_EVERY = 25  # navigations between heap checks
+# Playwright errors that mean the page or the browser itself is gone
+CRASH_ERROR_RE = re.compile(r"crash|has been closed|disconnected", re.IGNORECASE)
+
+HEAP_JS = "() => (performance.memory ? performance.memory.usedJSHeapSize : 0)"
+
+
+class BrowserCrashed(Exception):
+    """
+    The page, or the whole browser, died while it was in use. Its slot has
+    already been replaced; whatever it was fetching should be retried.
+    """
+
+
+class PooledPage:
+    def __init__(self, browser, context, page):
+        self.browser = browser
+        self.context = context
+        self.page = page
+        self.navigations = 0
+        self.crashed = False
+        page.on("crash", self.mark_crashed)
+
+    def mark_crashed(self, *_):
+        self.crashed = True
+
+
+class BrowserPool:
+    """
+    A bounded set of browser contexts shared by the scrape workers.
+
+    Each slot is recycled (context closed, a fresh one opened on next use)
+    after max_navigations or once its heap passes max_heap_mb, which keeps
+    Chromium's memory flat over long runs. A page that crashes is thrown
+    away and, if the browser went with it, the browser is relaunched with
+    `launch`; the caller gets BrowserCrashed so it can requeue the chapter.
+    """
+
+    def __init__(
+        self,
+        browser,
+        new_page,
+        size=POOL_SIZE,
+        launch=None,
+        max_navigations=MAX_NAVIGATIONS,
+        max_heap_mb=MAX_HEAP_MB,
+    ):
+        self.browser = browser
+        self.new_page = new_page  # async (browser) -> (context, page)
+        self.launch = launch  # async () -> browser, for restarts
+        self.max_navigations = max_navigations
+        self.max_heap_bytes = max_heap_mb * 1024 * 1024 if max_heap_mb else None
+        self.idle = asyncio.Queue()
+        for _ in range(size):
+            self.idle.put_nowait(None)  # a slot whose context opens on first use
+        self.relaunch_lock = asyncio.Lock()
+        self.recycled = 0
+        self.crashes = 0
+        self.restarts = 0
+
+    @asynccontextmanager
+    async def page(self):
+        """
+        Borrow a page for one navigation; waits while every slot is busy.
+        """
+        slot = await self.idle.get()
+        try:
+            if slot is not None and (slot.crashed or slot.browser is not self.browser):
+                await self._close(slot)
+                slot = None
+            if slot is None:
+                await self._ensure_browser()
+                slot = PooledPage(self.browser, *await self.new_page(self.browser))
+
+            try:
+                yield slot.page
+            except Exception as e:
+                if slot.crashed or not self.browser.is_connected() or CRASH_ERROR_RE.search(str(e)):
+                    self.crashes += 1
+                    await self._close(slot)
+                    slot = None
+                    await self._ensure_browser()
+                    raise BrowserCrashed(str(e)) from e
+                raise
+
+            slot.navigations += 1
+            if await self._worn_out(slot):
+                self.recycled += 1
+                await self._close(slot)
+                slot = None
+        finally:
+            self.idle.put_nowait(slot)
+
+    async def _worn_out(self, slot):
+        if slot.navigations >= self.max_navigations:
+            return True
+        if self.max_heap_bytes is None or slot.navigations % HEAP_CHECK_EVERY:
+            return False
+        try:
+            heap = await slot.page.evaluate(HEAP_JS)
+        except Exception:
+            return True  # a page that can't evaluate isn't worth keeping
+        return heap > self.max_heap_bytes
+
+    async def _ensure_browser(self):
+        if self.browser.is_connected():
+            return
+        async with self.relaunch_lock:
+            if self.browser.is_connected():
+                return  # another worker already relaunched it
+            if self.launch is None:
+                raise RuntimeError("Browser disconnected and the pool has no way to relaunch it")
+            print("Browser disconnected; relaunching...")
+            self.browser = await self.launch()
+            self.restarts += 1
+
+    async def _close(self, slot):
+        try:
+            await slot.context.close()
+        except Exception:
+            pass  # already gone with a crashed page or browser
+
+    async def close(self):
+        """
+        Close every context; the current browser (self.browser) is left to
+        the caller.
+        """
+        while not self.idle.empty():
+            slot = self.idle.get_nowait()
+            if slot is not None:
+                await self._close(slot)
+
+    def format_summary(self):
+        return (
+            f"Browser pool: {self.recycled} contexts recycled, "
+            f"{self.crashes} crashes, {self.restarts} browser restarts"
+        )
@@ -0,0 +1,158 @@
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from verse_keys import verse_bounds_columns
+
+PARQUET_SUFFIX = ".parquet"
+
+
+def _parquet():
+    """
+    pyarrow is only needed for Parquet output, so it is imported on first
+    use rather than with the rest of the pipeline.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Parquet output needs pyarrow: pip install pyarrow") from e
+    return pa, pq
+
+
+def to_columnar(df, language=None, text_chapters=False):
+    """
+    Typed copy of a Verses/Sentences/Parallel_Corpus frame: Book (and the
+    optional Language) dictionary-encoded, Chapter and Sentence as ints,
+    and verse labels kept as written plus their numeric verse_start and
+    verse_end. Book categories keep the frame's order, which is canonical.
+
+    Chapter stays text if any label isn't a number, or always with
+    text_chapters.
+    """
+    out = df.copy()
+    out["Book"] = pd.Categorical(out["Book"], categories=pd.unique(out["Book"]))
+
+    chapter = pd.to_numeric(out["Chapter"], errors="coerce")
+    if not text_chapters and chapter.notna().all():
+        out["Chapter"] = chapter.astype("int16")
+    else:
+        out["Chapter"] = out["Chapter"].astype(str)
+
+    if "Verse" in out:
+        out["Verse"] = out["Verse"].astype(str)
+        bounds = verse_bounds_columns(out["Verse"])
+        position = out.columns.get_loc("Verse") + 1
+        out.insert(position, "verse_start", bounds["verse_start"].astype("int32"))
+        out.insert(position + 1, "verse_end", bounds["verse_end"].astype("int32"))
+    if "Sentence" in out:
+        out["Sentence"] = pd.to_numeric(out["Sentence"]).astype("int32")
+
+    if language is not None:
+        out.insert(0, "Language", pd.Categorical([language] * len(out)))
+    return out.reset_index(drop=True)
+
+
+def book_slices(columnar):
+    """
+    (start, length) of each run of rows with the same book.
+    """
+    book = columnar["Book"]
+    starts = list((book != book.shift()).to_numpy().nonzero()[0]) + [len(columnar)]
+    return [(start, end - start) for start, end in zip(starts, starts[1:])]
+
+
+def write_parquet(df, out_file, language=None):
+    """
+    Write a frame whose rows are grouped by book as Parquet, one row group
+    per book, so readers filtering on Book only touch that book's pages.
+    The file is replaced atomically.
+    """
+    pa, pq = _parquet()
+    out_file = Path(out_file)
+    columnar = to_columnar(df, language)
+    table = pa.Table.from_pandas(columnar, preserve_index=False)
+
+    tmp = out_file.with_name(out_file.name + ".tmp")
+    with pq.ParquetWriter(tmp, table.schema) as writer:
+        if len(columnar) == 0:
+            writer.write_table(table)
+        for start, length in book_slices(columnar):
+            writer.write_table(table.slice(start, length))
+    os.replace(tmp, out_file)
+
+
+class ParquetAppender:
+    """
+    A Parquet file built one frame at a time, with one row group per book
+    as write_parquet lays it out. The file appears when it is closed.
+    """
+
+    def __init__(self, out_file, columns):
+        self.out_file = Path(out_file)
+        self.columns = columns
+        self.tmp = self.out_file.with_name(self.out_file.name + ".tmp")
+        self.writer = None
+
+    def append(self, df):
+        if len(df) == 0:
+            return  # its all-null columns would fix the wrong schema
+        pa, pq = _parquet()
+        # A later frame may hold a chapter label that isn't a number, so
+        # every frame keeps Chapter as text and texts as strings; the
+        # schema of the first frame then fits all of them
+        columnar = to_columnar(df, text_chapters=True)
+        for column in columnar.columns.difference(["Book", "Chapter", "verse_start", "verse_end", "Sentence"]):
+            columnar[column] = columnar[column].astype(str)
+        table = pa.Table.from_pandas(columnar, preserve_index=False)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.tmp, table.schema)
+        else:
+            table = table.cast(self.writer.schema)
+        for start, length in book_slices(columnar):
+            self.writer.write_table(table.slice(start, length))
+
+    def close(self):
+        if self.writer is None:
+            pa, pq = _parquet()
+            table = pa.Table.from_pandas(to_columnar(pd.DataFrame(columns=self.columns)), preserve_index=False)
+            self.writer = pq.ParquetWriter(self.tmp, table.schema)
+            self.writer.write_table(table)
+        self.writer.close()
+        os.replace(self.tmp, self.out_file)
+
+
+def iter_row_groups(path, columns=None):
+    """
+    Stream a Parquet file one row group at a time.
+    """
+    _, pq = _parquet()
+    parquet_file = pq.ParquetFile(path)
+    for i in range(parquet_file.num_row_groups):
+        yield parquet_file.read_row_group(i, columns=columns).to_pandas()
+
+
+def read_parquet(path, columns=None, books=None):
+    """
+    Load a Parquet table, reading only `columns` and, when `books` is
+    given, only the row groups of those books.
+    """
+    _parquet()
+    filters = [("Book", "in", list(books))] if books is not None else None
+    return pd.read_parquet(path, columns=columns, filters=filters)
+
+
+def read_table_chapters(out_file, header):
+    """
+    {(book, chapter): rows} from a Parquet Verses/Sentences table, rows as
+    the same strings the TSV reader returns.
+    """
+    chapters = {}
+    if not Path(out_file).exists():
+        return chapters
+    df = read_parquet(out_file, columns=header)
+    values = zip(*(df[col].astype(str) for col in header))
+    for book, chapter, *row in values:
+        chapters.setdefault((book, chapter), []).append(row)
+    return chapters
@@ -0,0 +1,421 @@
+import argparse
+import json
+import os
+import re
+import sqlite3
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from columnar import PARQUET_SUFFIX, read_parquet
+from export_binary import NO_VERSE, tokenize
+from metrics import METRICS
+from parallel_corpus import build_canonical_table, find_language_files, load_language_data
+from verse_keys import BOOK_IDS, KEY_COLUMNS, add_verse_keys
+
+CORPUS_DIR = "Parallel_Corpus"
+VERSES_DIR = "Verses"
+INDEX_PATH = "Parallel_Corpus/corpus_index.sqlite"
+NWAY_TABLE = "All_Languages_Parallel"  # written by create_parallel_corpus(all_languages=True)
+KEY_FIELDS = ["Book", "Chapter", "Verse"]
+RESULT_LIMIT = 20
+# "JHN 3:16", "John 3:16-18", or a whole chapter: "1 Kings 8"
+REFERENCE_RE = re.compile(r"^\s*(.+?)\s+(\d+)(?:\s*:\s*(\d+)(?:\s*-\s*(\d+))?)?\s*$")
+FOLDED_BOOK_IDS = {name.casefold(): book_id for name, book_id in BOOK_IDS.items()}
+
+# Postings are numpy arrays stored as blobs, one row per (language, term):
+#   verses       sorted ids of the verses containing the term (int32)
+#   occurrences  verse id of every occurrence, by verse then position
+#   positions    token position of every occurrence (int32)
+# Term lookups read only `verses`, which comes first so SQLite can stop
+# before the longer occurrence blobs.
+SCHEMA = """
+CREATE TABLE meta (name TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE verses (
+    id INTEGER PRIMARY KEY,
+    key INTEGER NOT NULL,
+    book TEXT NOT NULL,
+    chapter TEXT NOT NULL,
+    verse TEXT NOT NULL,
+    book_id INTEGER NOT NULL,
+    chapter_num INTEGER NOT NULL,
+    verse_start INTEGER NOT NULL,
+    verse_end INTEGER NOT NULL
+);
+CREATE TABLE texts (
+    verse_id INTEGER NOT NULL,
+    language TEXT NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (verse_id, language)
+) WITHOUT ROWID;
+CREATE TABLE postings (
+    language TEXT NOT NULL,
+    term TEXT NOT NULL,
+    verses BLOB NOT NULL,
+    occurrences BLOB NOT NULL,
+    positions BLOB NOT NULL,
+    PRIMARY KEY (language, term)
+) WITHOUT ROWID;
+"""
+POSTING_DTYPE = np.dtype("<i4")
+
+
+def index_terms(text):
+    """
+    The export tokenizer's tokens, case-folded: lookups ignore case.
+    """
+    return [token.casefold() for token in tokenize(text)]
+
+
+def load_nway_table(corpus_dir=CORPUS_DIR, verses_dir=VERSES_DIR):
+    """
+    The N-way table (Book, Chapter, Verse, then one text column per
+    language) as strings, and where it came from.
+
+    A saved All_Languages_Parallel table is used (Parquet before TSV)
+    unless a Verses table is newer. Otherwise, e.g. on the default
+    pairwise pipeline, which doesn't write it, the same table is built in
+    memory from the Verses tables.
+    """
+    path = None
+    for suffix in (PARQUET_SUFFIX, ".tsv"):
+        if (Path(corpus_dir) / f"{NWAY_TABLE}{suffix}").exists():
+            path = Path(corpus_dir) / f"{NWAY_TABLE}{suffix}"
+            break
+    verse_files = find_language_files(verses_dir)
+
+    if path is not None and any(p.stat().st_mtime > path.stat().st_mtime for p in verse_files.values()):
+        print(f"Warning: {path} is older than the Verses tables; indexing {verses_dir} instead")
+        path = None
+
+    if path is None:
+        if not verse_files:
+            raise FileNotFoundError(
+                f"Nothing to index: no {NWAY_TABLE} table in {corpus_dir} and no Verses tables in {verses_dir}; "
+                "run data_cleaning.py first"
+            )
+        language_data = load_language_data(verses_dir)
+        with METRICS.timer("align_seconds", pair="all"):
+            wide = build_canonical_table(language_data, sorted(language_data))
+        return wide.reset_index(drop=True).astype(str), Path(verses_dir)
+
+    if path.suffix == PARQUET_SUFFIX:
+        df = read_parquet(path)
+        df = df.drop(columns=[col for col in ("Language", "verse_start", "verse_end") if col in df])
+        return df.astype(str), path
+    return pd.read_csv(path, sep="\t", dtype=str, keep_default_na=False), path
+
+
+def build_postings(texts):
+    """
+    {term: (verses, occurrences, positions)} for one language's texts,
+    verse ids being row numbers.
+    """
+    occurrences = {}
+    positions = {}
+    for row, text in enumerate(texts):
+        if text == NO_VERSE:
+            continue
+        for position, term in enumerate(index_terms(text)):
+            occurrences.setdefault(term, []).append(row)
+            positions.setdefault(term, []).append(position)
+
+    postings = {}
+    for term, rows in occurrences.items():
+        rows = np.array(rows, dtype=POSTING_DTYPE)
+        postings[term] = (np.unique(rows), rows, np.array(positions[term], dtype=POSTING_DTYPE))
+    return postings
+
+
+@metrics.stage("corpus_index")
+def build_index(corpus_dir=CORPUS_DIR, index_path=INDEX_PATH, verses_dir=VERSES_DIR):
+    """
+    Index the N-way table (see load_nway_table) into index_path: every
+    verse with its key and texts, and per-language positional postings.
+    The index is written to a temporary file and swapped in, so readers
+    never see half of it.
+    """
+    df, source = load_nway_table(corpus_dir, verses_dir)
+    languages = [col for col in df.columns if col not in KEY_FIELDS]
+    keyed = add_verse_keys(df[KEY_FIELDS])
+
+    tmp = f"{index_path}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    Path(index_path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(tmp)
+    # A failed build is simply rebuilt, so skip the journal entirely
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.executescript(SCHEMA)
+
+    with conn:
+        conn.executemany(
+            "INSERT INTO verses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            zip(
+                range(len(df)),
+                keyed["key"].tolist(),
+                df["Book"],
+                df["Chapter"],
+                df["Verse"],
+                *(keyed[col].tolist() for col in KEY_COLUMNS),
+            ),
+        )
+        for language in languages:
+            conn.executemany(
+                "INSERT INTO texts VALUES (?, ?, ?)",
+                ((row, language, text) for row, text in enumerate(df[language])),
+            )
+            with METRICS.timer("index_seconds", language=language):
+                postings = build_postings(df[language])
+                conn.executemany(
+                    "INSERT INTO postings VALUES (?, ?, ?, ?, ?)",
+                    (
+                        (language, term, verses.tobytes(), rows.tobytes(), positions.tobytes())
+                        for term, (verses, rows, positions) in postings.items()
+                    ),
+                )
+            METRICS.inc("terms_indexed", len(postings), language=language)
+            print(f"Indexed {language}: {len(postings)} terms")
+        conn.execute("CREATE INDEX verses_reference ON verses (book_id, chapter_num, verse_start)")
+        conn.executemany(
+            "INSERT INTO meta VALUES (?, ?)",
+            [
+                ("languages", json.dumps(languages)),
+                ("source", str(source)),
+                ("built_at", str(time.time())),
+            ],
+        )
+    conn.close()
+    os.replace(tmp, index_path)
+    METRICS.inc("rows_written", len(df), table="corpus index")
+    print(f"Saved: {index_path} ({len(df)} verses, {len(languages)} languages)")
+
+
+def parse_reference(reference):
+    """
+    (book, chapter, first verse, last verse) of a reference; the verses
+    are None for a whole chapter.
+    """
+    match = REFERENCE_RE.match(reference)
+    if not match:
+        raise ValueError(f"Not a verse reference: {reference!r} (try 'JHN 3:16' or 'John 3')")
+    book, chapter, start, end = match.groups()
+    if start is None:
+        return book, int(chapter), None, None
+    return book, int(chapter), int(start), int(end or start)
+
+
+class CorpusIndex:
+    """
+    Read-only queries over an index built by build_index. Term, phrase and
+    verse lookups return verse ids; rows() turns them into aligned rows
+    with every language's text.
+    """
+
+    def __init__(self, path=INDEX_PATH):
+        if not Path(path).exists():
+            raise FileNotFoundError(f"No corpus index at {path}; build it with: python corpus_index.py build")
+        self.conn = sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True)
+        meta = dict(self.conn.execute("SELECT name, value FROM meta"))
+        self.languages = json.loads(meta["languages"])
+
+    def close(self):
+        self.conn.close()
+
+    def check_language(self, language):
+        if language not in self.languages:
+            raise ValueError(f"Unknown language {language!r}; the index has {', '.join(self.languages)}")
+
+    def term_verses(self, language, term):
+        row = self.conn.execute(
+            "SELECT verses FROM postings WHERE language = ? AND term = ?", (language, term)
+        ).fetchone()
+        return np.frombuffer(row[0], dtype=POSTING_DTYPE) if row else np.zeros(0, dtype=POSTING_DTYPE)
+
+    def term_occurrences(self, language, term):
+        row = self.conn.execute(
+            "SELECT occurrences, positions FROM postings WHERE language = ? AND term = ?", (language, term)
+        ).fetchone()
+        if row is None:
+            return np.zeros(0, dtype=POSTING_DTYPE), np.zeros(0, dtype=POSTING_DTYPE)
+        return np.frombuffer(row[0], dtype=POSTING_DTYPE), np.frombuffer(row[1], dtype=POSTING_DTYPE)
+
+    def search_languages(self, language):
+        if language is None:
+            return self.languages
+        self.check_language(language)
+        return [language]
+
+    def terms(self, text, language=None):
+        """
+        Verses where one language (any, if None) has every term of text.
+        """
+        terms = sorted(set(index_terms(text)))
+        found = np.zeros(0, dtype=POSTING_DTYPE)
+        if not terms:
+            return found
+        for lang in self.search_languages(language):
+            verses = None
+            for term in terms:
+                matches = self.term_verses(lang, term)
+                verses = matches if verses is None else np.intersect1d(verses, matches, assume_unique=True)
+                if not len(verses):
+                    break
+            found = np.union1d(found, verses)
+        return found
+
+    def phrase(self, text, language=None):
+        """
+        Verses where one language (any, if None) has the terms of text
+        next to each other, in order.
+        """
+        terms = index_terms(text)
+        found = np.zeros(0, dtype=POSTING_DTYPE)
+        if not terms:
+            return found
+        for lang in self.search_languages(language):
+            postings = [(offset, *self.term_occurrences(lang, term)) for offset, term in enumerate(terms)]
+            postings.sort(key=lambda posting: len(posting[1]))  # rarest term first
+            # An occurrence of the term at `offset` starts the phrase at
+            # position - offset: match on (verse, phrase start) packed into
+            # one int64
+            starts = None
+            for offset, rows, positions in postings:
+                keep = positions >= offset
+                packed = (rows[keep].astype(np.int64) << 32) | (positions[keep] - offset)
+                starts = packed if starts is None else np.intersect1d(starts, packed, assume_unique=True)
+                if not len(starts):
+                    break
+            found = np.union1d(found, np.unique(starts >> 32).astype(POSTING_DTYPE))
+        return found
+
+    def book_id(self, book):
+        if book.casefold() in FOLDED_BOOK_IDS:
+            return FOLDED_BOOK_IDS[book.casefold()]
+        # A book outside book-names.tsv: its id was assigned at build time
+        row = self.conn.execute(
+            "SELECT book_id FROM verses WHERE book = ? COLLATE NOCASE LIMIT 1", (book,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def verse(self, reference):
+        """
+        Verses (or spans such as "4-6") overlapping a reference like
+        "JHN 3:16", "John 3:16-18" or "John 3".
+        """
+        book, chapter, start, end = parse_reference(reference)
+        book_id = self.book_id(book)
+        if book_id is None:
+            raise ValueError(f"Unknown book {book!r}")
+        query = "SELECT id FROM verses WHERE book_id = ? AND chapter_num = ?"
+        params = [book_id, chapter]
+        if start is not None:
+            query += " AND verse_start <= ? AND verse_end >= ?"
+            params += [end, start]
+        rows = self.conn.execute(query + " ORDER BY id", params).fetchall()
+        return np.array([row[0] for row in rows], dtype=POSTING_DTYPE)
+
+    def rows(self, ids, languages=None):
+        """
+        Aligned rows for verse ids, in corpus order: Book, Chapter, Verse
+        and the text of each language (all of them by default).
+        """
+        ids = [int(i) for i in ids]
+        if not ids:
+            return []
+        languages = languages or self.languages
+        for language in languages:
+            self.check_language(language)
+        id_marks = ",".join("?" * len(ids))
+        language_marks = ",".join("?" * len(languages))
+
+        rows = {}
+        for verse_id, book, chapter, verse in self.conn.execute(
+            f"SELECT id, book, chapter, verse FROM verses WHERE id IN ({id_marks}) ORDER BY id", ids
+        ):
+            rows[verse_id] = {"Book": book, "Chapter": chapter, "Verse": verse}
+        for verse_id, language, text in self.conn.execute(
+            f"SELECT verse_id, language, text FROM texts WHERE verse_id IN ({id_marks}) AND language IN ({language_marks})",
+            ids + list(languages),
+        ):
+            rows[verse_id][language] = text
+        return [{**row, **{lang: row.get(lang, NO_VERSE) for lang in languages}} for row in rows.values()]
+
+    def search(self, kind, text, language=None, languages=None, limit=RESULT_LIMIT):
+        """
+        Run a "term", "phrase" or "verse" query; returns (number of
+        matching verses, the first `limit` of them as rows).
+        """
+        if kind == "term":
+            ids = self.terms(text, language)
+        elif kind == "phrase":
+            ids = self.phrase(text, language)
+        elif kind == "verse":
+            ids = self.verse(text)
+        else:
+            raise ValueError(f"Unknown query kind {kind!r}")
+        shown = ids[:limit] if limit is not None else ids
+        return len(ids), self.rows(shown, languages)
+
+
+def print_rows(rows):
+    for row in rows:
+        print(f"\n{row['Book']} {row['Chapter']}:{row['Verse']}")
+        for language, text in row.items():
+            if language not in KEY_FIELDS:
+                print(f"  {language}: {text}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index and query the parallel corpus")
+    parser.add_argument("--index", default=INDEX_PATH, help="index file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="index the N-way parallel corpus")
+    build.add_argument("--corpus-dir", default=CORPUS_DIR)
+    build.add_argument("--verses-dir", default=VERSES_DIR, help="used when there is no All_Languages_Parallel table")
+
+    for kind, help_text in [
+        ("term", "verses containing every word"),
+        ("phrase", "verses containing the words in sequence"),
+        ("verse", "a reference such as 'JHN 3:16', 'John 3:16-18' or 'John 3'"),
+    ]:
+        query = commands.add_parser(kind, help=help_text)
+        query.add_argument("text", nargs="+")
+        if kind != "verse":
+            query.add_argument("--lang", help="only search this language")
+        query.add_argument("--show", nargs="+", help="languages to print (default: all)")
+        query.add_argument("--limit", type=int, default=RESULT_LIMIT)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        try:
+            build_index(args.corpus_dir, args.index, args.verses_dir)
+        except FileNotFoundError as e:
+            parser.error(str(e))
+        return
+
+    try:
+        index = CorpusIndex(args.index)
+    except FileNotFoundError as e:
+        parser.error(str(e))
+    try:
+        start = time.perf_counter()
+        total, rows = index.search(
+            args.command, " ".join(args.text), getattr(args, "lang", None), args.show, args.limit
+        )
+        elapsed = (time.perf_counter() - start) * 1000
+    except ValueError as e:
+        parser.error(str(e))
+    finally:
+        index.close()
+    print(f"{total} verse{'s' if total != 1 else ''} ({elapsed:.1f} ms), showing {len(rows)}")
+    print_rows(rows)
+
+
+if __name__ == "__main__":
+    main()
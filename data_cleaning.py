@@ -1,10 +1,21 @@
 import pcre2
 import csv
+import functools
+import hashlib
+import json
 import os
+import re
 import time
 from pathlib import Path
 from concurrent.futures import ProcessPoolExecutor
 
+import pandas as pd
+
+import metrics
+from columnar import PARQUET_SUFFIX, read_table_chapters, write_parquet
+from metrics import METRICS, Progress, collected
+from raw_store import RawStore, is_raw_store
+
 
 VERSE_RULES = [
     (
@@ -59,174 +70,638 @@ def load_book_names(file_path):
 BOOK_MAPPING = load_book_names("book-names.tsv")
 
 
-def apply_rules(text: str, rules) -> str:
-    for pattern_str, repl in rules:
+_stores = {}
+
+
+def open_store(root):
+    # One RawStore per archive per process; SQLite handles must not be
+    # shared with forked workers.
+    key = (os.getpid(), root)
+    if key not in _stores:
+        _stores[key] = RawStore(root)
+    return _stores[key]
+
+
+def list_sources(input_path):
+    """
+    HTML files under input_path, or (archive, key) pairs when input_path is
+    a RawStore; archived pages are listed in on-disk order so they are read
+    back as a sequential scan of each shard.
+    """
+    if is_raw_store(input_path):
+        return [(input_path, key) for key in open_store(input_path).keys()]
+    return list(input_path.rglob("*.html"))
+
+
+def read_source(source):
+    """
+    Return (filename, text) for an HTML file or an archived page.
+    """
+    if isinstance(source, tuple):
+        root, key = source
+        return key + ".html", open_store(root).get(key)
+    with source.open("r", encoding="utf-8") as f:
+        return source.name, f.read()
+
+
+def source_size(source):
+    if isinstance(source, tuple):
+        root, key = source
+        return open_store(root).info(key)["raw_size"]
+    return source.stat().st_size
+
+
+class RulePipeline:
+    """
+    A rule list compiled and JIT-compiled once, then reused for every file.
+
+    With `extract=n`, the first n rules must each pull one captured span onto
+    its own marker line (e.g. "\r\n@$1\r\n") and the rule after them must
+    drop every other line of the page. Those n + 1 full-page passes are done
+    as one findall over an alternation of the extraction patterns, so only
+    the small extracted text reaches the remaining rules.
+    """
+
+    def __init__(self, rules, extract=0):
+        self.rules = tuple(rules)
+        self.extract = extract
+        self.extractor = None
+        self.markers = []
+
+        if extract:
+            for pattern_str, repl in self.rules[:extract]:
+                prefix, _, suffix = repl.partition("$1")
+                self.markers.append((prefix.strip("\r\n"), suffix.strip("\r\n")))
+            self.extractor = self._compile_extractor(
+                "|".join(pattern_str for pattern_str, _ in self.rules[:extract])
+            )
+            remaining = self.rules[extract + 1 :]
+        else:
+            remaining = self.rules
+
+        self.compiled = [
+            (self._compile(pattern_str), repl) for pattern_str, repl in remaining
+        ]
+        # Per-rule timing labels; a rule shared by several pipelines is one series
+        self.rule_labels = [pattern_str[:40] for pattern_str, _ in remaining]
+
+    @staticmethod
+    def _compile(pattern_str):
         pattern = pcre2.compile(pattern_str, pcre2.MULTILINE)
-        text = pattern.sub(repl, text)
-    return text.strip()
+        pattern.jit_compile()
+        return pattern
+
+    @staticmethod
+    def _compile_extractor(pattern_str):
+        # pcre2's findall pays a few microseconds per match, which for a
+        # chapter's ~100 matches costs more than the passes it saves; the
+        # extraction patterns are plain enough for re, whose findall doesn't
+        try:
+            return re.compile(pattern_str, re.MULTILINE)
+        except re.error:
+            return RulePipeline._compile(pattern_str)
+
+    def __reduce__(self):
+        # Compiled patterns stay in the process that built them; workers
+        # receiving a pipeline recompile it once on unpickling.
+        return (RulePipeline, (self.rules, self.extract))
+
+    def extract_items(self, text):
+        """
+        The marker lines the extraction rules would leave, e.g. ["@1", "%In
+        the beginning..."], in page order.
+        """
+        if metrics.RULE_TIMING:
+            with METRICS.timer("rule_seconds", rule="extract"):
+                return self._extract_items(text)
+        return self._extract_items(text)
+
+    def _extract_items(self, text):
+        items = []
+        for groups in self.extractor.findall(text):
+            if isinstance(groups, str):
+                groups = (groups,)
+            for (prefix, suffix), value in zip(self.markers, groups):
+                if value:
+                    items.append(prefix + value + suffix)
+                    break
+        return items
+
+    def apply(self, text):
+        if self.extractor is not None:
+            text = "\r\n".join(self.extract_items(text))
+        if metrics.RULE_TIMING:
+            for (pattern, repl), label in zip(self.compiled, self.rule_labels):
+                with METRICS.timer("rule_seconds", rule=label):
+                    text = pattern.sub(repl, text)
+        else:
+            for pattern, repl in self.compiled:
+                text = pattern.sub(repl, text)
+        return text.strip()
+
+
+@functools.lru_cache(maxsize=None)
+def compile_rules(rules, extract=0):
+    return RulePipeline(rules, extract)
+
+
+# Verse labels and verse content are pulled out in one scan of the page;
+# every later rule only sees the extracted text.
+VERSE_PIPELINE = compile_rules(tuple(VERSE_RULES), extract=2)
+SENTENCE_PIPELINE = compile_rules(tuple(SENTENCE_RULES), extract=1)
+
+# Single-pass segmentation: extract verse labels and content once, then
+# finish the verse and sentence rules on the shared extracted items.
+EXTRACT_PIPELINE = compile_rules(tuple(VERSE_RULES[:3]), extract=2)
+VERSE_TAIL = compile_rules(tuple(VERSE_RULES[3:]))
+SENTENCE_TAIL = compile_rules(tuple(SENTENCE_RULES[2:]))
 
 
-def process_verse_file(file, verses_path, sentences_path):
-    with file.open("r", encoding="utf-8") as f:
-        text = f.read()
+def apply_rules(text: str, rules) -> str:
+    if not isinstance(rules, RulePipeline):
+        rules = compile_rules(tuple(rules))
+    return rules.apply(text)
 
-    print("Processing: " + file.name)
-    verse_segment = apply_rules(text, VERSE_RULES)
 
-    filename = os.path.basename(file)
+def parse_chapter_name(filename):
+    """
+    Split "{book}.{chapter}.{ver}.{lang}.html" into its parts, or None.
+    """
     name_no_ext = filename.rsplit(".", 1)[0]
     name_parts = name_no_ext.split(".")
 
     if len(name_parts) != 4:
         print(f"Skipping file with unexpected name format: {filename} -> {name_parts}")
-        return "N/A"
+        return None
+    return name_parts
 
-    book_acro, chapter, ver, lang = name_parts
-    book = BOOK_MAPPING.get(book_acro, book_acro)
 
-    verse_file = (verses_path / lang).with_suffix(".tsv")
+def verse_rows(verse_segment, filename):
+    rows = []
+    for row in verse_segment.splitlines():
+        if row.startswith("Verse "):
+            left, sep, right = row[6:].partition(":")
+            if not sep:
+                print(f"Skipping malformed verse line in {filename}: {row}")
+                continue
+            verse_num = left.strip()
+            verse_text = right.strip()
+            rows.append([verse_num, verse_text])
+    return rows
 
-    verse_file.parent.mkdir(parents=True, exist_ok=True)
 
-    # Only write header if file does not exist or is empty
-    write_header_verse = not verse_file.exists() or verse_file.stat().st_size == 0
-    
-    with verse_file.open("a", encoding="utf-8", newline="") as f:
-        writer = csv.writer(f, delimiter="\t")
-        if write_header_verse:
-            writer.writerow(["Book", "Chapter", "Verse", "Text"])
-        for row in verse_segment.splitlines():
-            if row.startswith("Verse "):
-                left, sep, right = row[6:].partition(":")
-                if not sep:
-                    print(f"Skipping malformed verse line in {filename}: {row}")
-                    continue
-                verse_num = left.strip()
-                verse_text = right.strip()
-                writer.writerow([book, chapter, verse_num, verse_text])
+def sentence_rows(sentence_segment):
+    rows = []
+    for idx, sentence in enumerate(sentence_segment.splitlines(), start=1):
+        sentence_text = sentence.strip()
+        if sentence_text:
+            rows.append([idx, sentence_text])
+    return rows
 
-    return str(filename)
 
+VERSE_HEADER = ["Book", "Chapter", "Verse", "Text"]
+SENTENCE_HEADER = ["Book", "Chapter", "Sentence", "Text"]
 
-def process_sentences_file(file, sentences_path):
-    with file.open("r", encoding="utf-8") as f:
-        text = f.read()
+# Canonical book order (book-names.tsv is in biblical order)
+BOOK_ORDER = {acronym: idx for idx, acronym in enumerate(BOOK_MAPPING)}
 
-    print("Processing sentences: " + file.name)
-    sentence_segment = apply_rules(text, SENTENCE_RULES)
+# Bytes of HTML a worker should get before another process is worth starting
+MIN_BYTES_PER_WORKER = 4 * 1024 * 1024
 
-    filename = os.path.basename(file)
-    name_no_ext = filename.rsplit(".", 1)[0]
-    name_parts = name_no_ext.split(".")
 
-    if len(name_parts) != 4:
-        print(f"Skipping file with unexpected name format: {filename} -> {name_parts}")
-        return "N/A"
+def chapter_sort_key(result):
+    chapter = result["chapter"]
+    return (
+        BOOK_ORDER.get(result["book_acro"], len(BOOK_ORDER)),
+        result["book_acro"],
+        int(chapter) if chapter.isdigit() else float("inf"),
+        chapter,
+    )
+
 
+def chapter_result(filename, name_parts, verses=None, sentences=None):
     book_acro, chapter, ver, lang = name_parts
-    book = BOOK_MAPPING.get(book_acro, book_acro)
+    return {
+        "filename": filename,
+        "lang": lang,
+        "book_acro": book_acro,
+        "book": BOOK_MAPPING.get(book_acro, book_acro),
+        "chapter": chapter,
+        "verses": verses,
+        "sentences": sentences,
+    }
+
+
+def segment_chapter(text, filename):
+    """
+    Verse rows and sentence rows for one chapter page from a single
+    extraction pass.
+    """
+    items = EXTRACT_PIPELINE.extract_items(text)
+    verse_segment = VERSE_TAIL.apply("\r\n".join(items))
+    sentence_segment = SENTENCE_TAIL.apply(
+        "\r\n".join(item for item in items if item.startswith("%"))
+    )
+    return verse_rows(verse_segment, filename), sentence_rows(sentence_segment)
+
+
+# Workers only read and segment; the parent process is the single writer of
+# every output file, so workers never race on the same TSV.
+def process_verse_file(file):
+    filename, text = read_source(file)
+    name_parts = parse_chapter_name(filename)
+    if name_parts is None:
+        return None
+    verse_segment = apply_rules(text, VERSE_PIPELINE)
+    return chapter_result(filename, name_parts, verses=verse_rows(verse_segment, filename))
+
+
+def process_sentences_file(file):
+    filename, text = read_source(file)
+    name_parts = parse_chapter_name(filename)
+    if name_parts is None:
+        return None
+    sentence_segment = apply_rules(text, SENTENCE_PIPELINE)
+    return chapter_result(filename, name_parts, sentences=sentence_rows(sentence_segment))
+
+
+def process_chapter_file(file):
+    """
+    Read a page once and segment it into both verse and sentence rows.
+    """
+    filename, text = read_source(file)
+    return process_chapter_page(filename, text)
+
+
+def process_chapter_page(filename, text):
+    """
+    process_chapter_file for a page that is already in memory, e.g. one
+    handed over straight from the scraper.
+    """
+    name_parts = parse_chapter_name(filename)
+    if name_parts is None:
+        return None
+    verses, sentences = segment_chapter(text, filename)
+    return chapter_result(filename, name_parts, verses=verses, sentences=sentences)
 
-    sentence_file = (sentences_path / lang).with_suffix(".tsv")
-    sentence_file.parent.mkdir(parents=True, exist_ok=True)
 
-    write_header = not sentence_file.exists() or sentence_file.stat().st_size == 0
+def choose_workers(files):
+    total_size = sum(source_size(f) for f in files)
+
+    # No hard cap: large corpora use every core, small ones stay serial
+    workers = max(1, min(os.cpu_count() or 1, total_size // MIN_BYTES_PER_WORKER))
+    print(f"Using {workers} worker{'s' if workers > 1 else ''}")
+    return workers
+
+
+def measured(process, file):
+    """
+    process(file) with its time and outcome recorded in METRICS.
+    """
+    start = time.perf_counter()
+    result = process(file)
+    METRICS.observe("segment_seconds", time.perf_counter() - start)
+    if result is None:
+        METRICS.inc("pages_skipped")
+    else:
+        METRICS.inc("pages_segmented", lang=result["lang"])
+    return result
 
-    with sentence_file.open("a", encoding="utf-8", newline="") as f:
-        writer = csv.writer(f, delimiter="\t")
-        if write_header:
-            writer.writerow(["Book", "Chapter", "Sentence", "Text"])
-        
-        for idx, sentence in enumerate(sentence_segment.splitlines(), start=1):
-            sentence_text = sentence.strip()
-            if sentence_text:  
-                writer.writerow([book, chapter, idx, sentence_text])
 
-    return str(filename)
+def run_segmentation(files, process, workers):
+    if workers is None:
+        workers = choose_workers(files)
 
+    results = []
+    progress = Progress("Segmented", total=len(files))
+    if workers == 1:
+        for f in files:
+            results.append(measured(process, f))
+            progress.update()
+    else:
+        # Workers send back what they recorded with every page
+        chunksize = max(1, len(files) // (workers * 8))
+        task = functools.partial(collected, measured, process)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for result, snapshot in executor.map(task, files, chunksize=chunksize):
+                METRICS.merge(snapshot)
+                results.append(result)
+                progress.update()
 
-def choose_workers(files):
-    total_size = sum(f.stat().st_size for f in files)
-    avg_size = total_size / len(files)
+    return [r for r in results if r is not None]
 
-    if len(files) > 500 and avg_size < 50_000:
-        print("Using single process")
-        return 1
-    else:
-        max_workers = min(os.cpu_count() or 4, 4)
-        print(f"Using {max_workers} workers")
-        return max_workers
 
+# Incremental runs remember which page version every output row came from
+STATE_NAME = ".segment-state.json"
+
+# "tsv", or "parquet" for typed, book-partitioned tables (needs pyarrow)
+OUTPUT_FORMAT = "tsv"
+
+BOOK_ACRONYMS = {full_name: acronym for acronym, full_name in BOOK_MAPPING.items()}
+
+
+def table_sort_key(book, chapter):
+    book_acro = BOOK_ACRONYMS.get(book, book)
+    return chapter_sort_key({"book_acro": book_acro, "chapter": chapter})
+
+
+def write_lang_table(out_file, header, chapters):
+    """
+    chapters: {(book, chapter): rows}; written in canonical order.
+    """
+    with out_file.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, delimiter="\t")
+        writer.writerow(header)
+        for book, chapter in sorted(chapters, key=lambda k: table_sort_key(*k)):
+            for row in chapters[(book, chapter)]:
+                writer.writerow([book, chapter, *row])
 
-def segment_verses(input_folder, verses_folder, workers=None):
-    input_path = Path(input_folder).resolve()
-    verses_path = Path(verses_folder).resolve()
 
-    files = list(input_path.rglob("*.html"))
+def read_lang_table(out_file):
+    chapters = {}
+    if not out_file.exists():
+        return chapters
+    with out_file.open("r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f, delimiter="\t")
+        next(reader, None)  # header
+        for row in reader:
+            chapters.setdefault((row[0], row[1]), []).append(row[2:])
+    return chapters
+
+
+def write_parquet_table(out_file, header, chapters, lang):
+    rows = []
+    for book, chapter in sorted(chapters, key=lambda k: table_sort_key(*k)):
+        for row in chapters[(book, chapter)]:
+            rows.append([book, chapter, *row])
+    write_parquet(pd.DataFrame(rows, columns=header), out_file, language=lang)
+
+
+def table_file(out_path, lang, output_format=OUTPUT_FORMAT):
+    if output_format == "parquet":
+        return (out_path / lang).with_suffix(PARQUET_SUFFIX)
+    return (out_path / lang).with_suffix(".tsv")
+
+
+def write_tables(results, out_path, field, header, stale=None, output_format=OUTPUT_FORMAT):
+    """
+    Write one TSV (or Parquet file) per language with chapters in canonical
+    (book, chapter) order and rows in page order.
+
+    Without `stale` every language file in `results` is rebuilt from
+    scratch. With `stale` ({lang: {(book, chapter)}}), existing files are
+    updated in place: stale chapters and chapters in `results` are
+    replaced, every other row is kept.
+    """
+    by_lang = {}
+    for result in results:
+        by_lang.setdefault(result["lang"], {})[(result["book"], result["chapter"])] = result[field]
+
+    langs = set(by_lang)
+    if stale is not None:
+        langs |= set(stale)
+
+    out_path.mkdir(parents=True, exist_ok=True)
+    for lang in langs:
+        out_file = table_file(out_path, lang, output_format)
+        chapters = {}
+        if stale is not None:
+            if output_format == "parquet":
+                chapters = read_table_chapters(out_file, header)
+            else:
+                chapters = read_lang_table(out_file)
+            for key in stale.get(lang, ()):
+                chapters.pop(key, None)
+        chapters.update(by_lang.get(lang, {}))
+        METRICS.inc("rows_written", sum(len(rows) for rows in chapters.values()), table=field, lang=lang)
+        if output_format == "parquet":
+            write_parquet_table(out_file, header, chapters, lang)
+        else:
+            write_lang_table(out_file, header, chapters)
+
+
+def source_id(source, input_path):
+    if isinstance(source, tuple):
+        return source[1]
+    return source.relative_to(input_path).as_posix()
+
+
+def source_fingerprint(source):
+    if isinstance(source, tuple):
+        root, key = source
+        info = open_store(root).info(key)
+        return {"size": info["raw_size"], "sha256": info["sha256"]}
+    stat = source.stat()
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def state_name(output_format):
+    """
+    Each output format keeps its own state, so switching formats rebuilds
+    the new format's tables in full instead of writing only changed pages.
+    """
+    if output_format == "tsv":
+        return STATE_NAME
+    return STATE_NAME.replace(".json", f".{output_format}.json")
+
+
+def load_state(out_path, output_format=OUTPUT_FORMAT):
+    state_file = out_path / state_name(output_format)
+    if not state_file.exists():
+        return {}
+    with state_file.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(out_path, state, output_format=OUTPUT_FORMAT):
+    out_path.mkdir(parents=True, exist_ok=True)
+    name = state_name(output_format)
+    tmp = out_path / (name + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, out_path / name)
+
+
+def plan_incremental(files, input_path, state):
+    """
+    Compare sources with the saved state. Returns the sources to segment,
+    the stale chapters to drop per language and the updated state.
+    """
+    todo = []
+    new_state = {}
+    seen = set()
+
+    for source in files:
+        sid = source_id(source, input_path)
+        seen.add(sid)
+        fingerprint = source_fingerprint(source)
+        old = state.get(sid)
+
+        if old is not None and all(old.get(k) == v for k, v in fingerprint.items()):
+            new_state[sid] = old
+            continue
+
+        if not isinstance(source, tuple):
+            # Touched but not edited files keep their rows
+            fingerprint["sha256"] = file_sha256(source)
+            if old is not None and old.get("sha256") == fingerprint["sha256"]:
+                new_state[sid] = {**old, **fingerprint}
+                continue
+
+        name_parts = parse_chapter_name(sid.rsplit("/", 1)[-1])
+        if name_parts is not None:
+            book_acro, chapter, ver, lang = name_parts
+            fingerprint.update(
+                lang=lang, book=BOOK_MAPPING.get(book_acro, book_acro), chapter=chapter
+            )
+        new_state[sid] = fingerprint
+        todo.append(source)
+
+    changed = {source_id(source, input_path) for source in todo}
+    stale = {}
+    for sid, entry in state.items():
+        if (sid not in seen or sid in changed) and "lang" in entry:
+            stale.setdefault(entry["lang"], set()).add((entry["book"], entry["chapter"]))
+
+    return todo, stale, new_state
+
+
+def load_files(input_folder):
+    input_path = Path(input_folder).resolve()
+    files = list_sources(input_path)
     print(f"{len(files)} HTML files to process under {input_path}")
 
     if not files:
         print("No HTML files found. Check path/extension.")
-        return
+    return files
 
-    if workers is None:
-        workers = choose_workers(files)
 
+def run_incremental(input_folder, outputs, process, workers, output_format=OUTPUT_FORMAT):
+    """
+    Segment only new or changed pages and replace just their chapters in
+    each output; outputs is a list of (out_path, field, header).
+
+    Each output keeps its own state, so an output written by another run
+    (or deleted since) is brought up to date on its own; pages stale in
+    any output are segmented once for all of them.
+    """
+    input_path = Path(input_folder).resolve()
+    files = load_files(input_folder)
+
+    plans = []
+    todo = {}
+    for out_path, field, header in outputs:
+        state = load_state(out_path, output_format)
+        # Rows of a deleted table are gone; segment its pages again
+        state = {
+            sid: entry for sid, entry in state.items()
+            if "lang" not in entry or table_file(out_path, entry["lang"], output_format).exists()
+        }
+        out_todo, stale, new_state = plan_incremental(files, input_path, state)
+        plans.append((out_todo, stale, new_state))
+        for source in out_todo:
+            todo.setdefault(source_id(source, input_path), source)
+    print(f"{len(todo)} new or changed pages, {len(files) - len(todo)} unchanged")
+
+    if not todo and not any(stale for _, stale, _ in plans):
+        return
+
+    results = run_segmentation(list(todo.values()), process, workers) if todo else []
+    for (out_path, field, header), (out_todo, stale, new_state) in zip(outputs, plans):
+        chapters = set()
+        for source in out_todo:
+            entry = new_state[source_id(source, input_path)]
+            if "lang" in entry:
+                chapters.add((entry["lang"], entry["book"], entry["chapter"]))
+        out_results = [r for r in results if (r["lang"], r["book"], r["chapter"]) in chapters]
+        if out_results or stale:
+            write_tables(out_results, out_path, field, header, stale=stale, output_format=output_format)
+        save_state(out_path, new_state, output_format)
+
+
+@metrics.stage("segmentation")
+def segment_verses(input_folder, verses_folder, workers=None, incremental=False, output_format=OUTPUT_FORMAT):
     start = time.time()
+    verses_path = Path(verses_folder).resolve()
 
-    # Made it 1 worker for now because of race conditions on writing to same file
-    if workers:
-        for f in files:
-            result = process_verse_file(f, verses_path, None)
-            print("Processed:", result)
+    if incremental:
+        run_incremental(
+            input_folder,
+            [(verses_path, "verses", VERSE_HEADER)],
+            process_verse_file,
+            workers,
+            output_format,
+        )
     else:
-        with ProcessPoolExecutor(max_workers=workers) as executor:
-            for result in executor.map(
-                process_verse_file,
-                files,
-                [verses_path] * len(files),
-                [None] * len(files),
-            ):
-                print("Processed:", result)
+        files = load_files(input_folder)
+        if not files:
+            return
+        results = run_segmentation(files, process_verse_file, workers)
+        write_tables(results, verses_path, "verses", VERSE_HEADER, output_format=output_format)
 
     print("Finished in", round(time.time() - start, 2), "seconds")
 
 
-def segment_sentences(input_folder, sentence_folder, workers=None):
-    input_path = Path(input_folder).resolve()
+@metrics.stage("segmentation")
+def segment_sentences(input_folder, sentence_folder, workers=None, incremental=False, output_format=OUTPUT_FORMAT):
+    start = time.time()
     sentences_path = Path(sentence_folder).resolve()
 
-    files = list(input_path.rglob("*.html"))
-    print(f"{len(files)} HTML files to process for sentences under {input_path}")
+    if incremental:
+        run_incremental(
+            input_folder,
+            [(sentences_path, "sentences", SENTENCE_HEADER)],
+            process_sentences_file,
+            workers,
+            output_format,
+        )
+    else:
+        files = load_files(input_folder)
+        if not files:
+            return
+        results = run_segmentation(files, process_sentences_file, workers)
+        write_tables(results, sentences_path, "sentences", SENTENCE_HEADER, output_format=output_format)
 
-    if not files:
-        print("No HTML files found. Check path/extension.")
-        return
+    print("Finished sentence segmentation in", round(time.time() - start, 2), "seconds")
 
-    if workers is None:
-        workers = choose_workers(files)
 
+@metrics.stage("segmentation")
+def segment_corpus(input_folder, verses_folder, sentences_folder, workers=None, incremental=False, output_format=OUTPUT_FORMAT):
+    """
+    Verses and sentences in one scan of the corpus: each page is read and
+    its verse content extracted once, then written to both outputs.
+    """
     start = time.time()
+    outputs = [
+        (Path(verses_folder).resolve(), "verses", VERSE_HEADER),
+        (Path(sentences_folder).resolve(), "sentences", SENTENCE_HEADER),
+    ]
 
-    # Single-threaded to avoid race conditions
-    if workers:
-        for f in files:
-            result = process_sentences_file(f, sentences_path)
-            print("Processed:", result)
+    if incremental:
+        run_incremental(input_folder, outputs, process_chapter_file, workers, output_format)
     else:
-        with ProcessPoolExecutor(max_workers=workers) as executor:
-            for result in executor.map(
-                process_sentences_file,
-                files,
-                [sentences_path] * len(files),
-            ):
-                print("Processed:", result)
+        files = load_files(input_folder)
+        if not files:
+            return
+        results = run_segmentation(files, process_chapter_file, workers)
+        for out_path, field, header in outputs:
+            write_tables(results, out_path, field, header, output_format=output_format)
 
-    print("Finished sentence segmentation in", round(time.time() - start, 2), "seconds")
+    print("Finished verses and sentences in", round(time.time() - start, 2), "seconds")
 
 
 if __name__ == "__main__":
-    # First pass: segment verses
-    segment_verses("Original-Text", "Verses")
-    
-    # Second pass: segment sentences grouped by chapter
-    segment_sentences("Original-Text", "Sentences")
+    # Read pages from the scraper's archive when there is one
+    source = "Raw-Store" if is_raw_store("Raw-Store") else "Original-Text"
+
+    # Verses and sentences from a single pass over the pages; only pages
+    # added or changed since the last run are segmented again
+    segment_corpus(source, "Verses", "Sentences", incremental=True)
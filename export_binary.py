@@ -0,0 +1,316 @@
+import json
+import os
+import re
+from bisect import bisect_right
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from columnar import PARQUET_SUFFIX, read_parquet
+from metrics import METRICS
+from parallel_corpus import LANGUAGE_PAIRS
+from verse_keys import add_verse_keys
+
+# Shard file layout: MAGIC, a space-padded JSON header describing the
+# arrays, then each array at an ALIGN-ed byte offset:
+#   keys              int64 verse key per example (verse_keys.pack_keys)
+#   {lang}_offsets    int64, examples + 1; example i is tokens[o[i]:o[i+1]]
+#   {lang}_tokens     token ids, uint16 or uint32 depending on the vocab
+MAGIC = b"NLPSHRD1"
+HEADER_BYTES = 4096
+ALIGN = 64
+SHARD_EXAMPLES = 250_000  # verse pairs per shard file
+SHARD_GLOB = "shard-*.bin"
+VOCAB_FILE = "vocab.txt"
+
+SPECIAL_TOKENS = ["<pad>", "<unk>", "<bos>", "<eos>"]
+PAD_ID, UNK_ID, BOS_ID, EOS_ID = range(len(SPECIAL_TOKENS))
+MIN_COUNT = 1  # rarer tokens are exported as <unk>
+MAX_VOCAB = None  # or keep only this many ids (special tokens included)
+LOWERCASE = False
+TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+NO_VERSE = "<no verse>"
+
+
+def tokenize(text):
+    """
+    Words and single punctuation marks. Shared with the corpus index so
+    both agree on what a token is.
+    """
+    if LOWERCASE:
+        text = text.lower()
+    return TOKEN_RE.findall(text)
+
+
+class Vocab:
+    """
+    One vocabulary for every language: the special tokens, then tokens by
+    descending count. A token's id is its line number in vocab.txt.
+    """
+
+    def __init__(self, tokens):
+        self.tokens = list(tokens)
+        self.ids = {token: i for i, token in enumerate(self.tokens)}
+
+    @classmethod
+    def build(cls, counts, min_count=MIN_COUNT, max_vocab=MAX_VOCAB):
+        ranked = sorted((t for t, n in counts.items() if n >= min_count), key=lambda t: (-counts[t], t))
+        ranked = [t for t in ranked if t not in SPECIAL_TOKENS]
+        if max_vocab is not None:
+            ranked = ranked[: max(0, max_vocab - len(SPECIAL_TOKENS))]
+        return cls(SPECIAL_TOKENS + ranked)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls(line.rstrip("\n") for line in f)
+
+    def save(self, path):
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.writelines(token + "\n" for token in self.tokens)
+        os.replace(tmp, path)
+
+    def __len__(self):
+        return len(self.tokens)
+
+    @property
+    def dtype(self):
+        return np.dtype(np.uint16 if len(self) <= 1 << 16 else np.uint32)
+
+    def encode(self, tokens):
+        return np.array([self.ids.get(token, UNK_ID) for token in tokens], dtype=self.dtype)
+
+    def decode(self, ids):
+        return " ".join(self.tokens[i] for i in ids)
+
+
+def pair_file(corpus_dir, lang1, lang2):
+    """
+    The pair's Parallel_Corpus table, preferring Parquet over TSV, or None.
+    """
+    for suffix in (PARQUET_SUFFIX, ".tsv"):
+        path = Path(corpus_dir) / f"{lang1}_{lang2}_Parallel{suffix}"
+        if path.exists():
+            return path
+    return None
+
+
+def load_pair(path, lang1, lang2):
+    columns = ["Book", "Chapter", "Verse", lang1, lang2]
+    if path.suffix == PARQUET_SUFFIX:
+        return read_parquet(path, columns=columns).astype(str)
+    return pd.read_csv(path, sep="\t", dtype=str, keep_default_na=False)[columns]
+
+
+def aligned(offset):
+    return -(-offset // ALIGN) * ALIGN
+
+
+def write_shard(path, languages, keys, sequences, vocab):
+    """
+    Write one shard; sequences maps each language to a list of token id
+    arrays, one per example.
+    """
+    arrays = {"keys": np.asarray(keys, dtype="<i8")}
+    for language in languages:
+        lengths = np.fromiter((len(s) for s in sequences[language]), dtype=np.int64, count=len(keys))
+        offsets = np.zeros(len(keys) + 1, dtype="<i8")
+        np.cumsum(lengths, out=offsets[1:])
+        arrays[f"{language}_offsets"] = offsets
+        arrays[f"{language}_tokens"] = (
+            np.concatenate(sequences[language]).astype(vocab.dtype.newbyteorder("<"))
+            if len(keys) else np.zeros(0, dtype=vocab.dtype.newbyteorder("<"))
+        )
+
+    layout = {}
+    position = HEADER_BYTES
+    for name, array in arrays.items():
+        position = aligned(position)
+        layout[name] = {"dtype": array.dtype.str, "offset": position, "length": len(array)}
+        position += array.nbytes
+    header = json.dumps({
+        "format": 1,
+        "languages": list(languages),
+        "examples": len(keys),
+        "vocab_size": len(vocab),
+        "arrays": layout,
+    }).encode("utf-8")
+    if len(MAGIC) + len(header) > HEADER_BYTES:
+        raise ValueError(f"Shard header for {path} does not fit in {HEADER_BYTES} bytes")
+
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + header.ljust(HEADER_BYTES - len(MAGIC)))
+        for name, array in arrays.items():
+            f.write(b"\0" * (layout[name]["offset"] - f.tell()))
+            f.write(np.ascontiguousarray(array).tobytes())
+    os.replace(tmp, path)
+    return position
+
+
+@metrics.stage("export_binary")
+def export_binary(
+    language_pairs=LANGUAGE_PAIRS,
+    corpus_dir="Parallel_Corpus",
+    output_dir="Binary_Corpus",
+    shard_examples=SHARD_EXAMPLES,
+    skip_missing=True,
+):
+    """
+    Tokenize the pair tables once into {output_dir}/vocab.txt and
+    {output_dir}/{lang1}_{lang2}/shard-NNNNN.bin, for trainers to
+    memory-map with BinaryCorpus. With skip_missing, verses that one side
+    lacks ("<no verse>") are left out.
+    """
+    pairs = {}
+    for lang1, lang2 in language_pairs:
+        path = pair_file(corpus_dir, lang1, lang2)
+        if path is None:
+            print(f"Warning: No parallel corpus for {lang1}-{lang2}. Skipping pair.")
+            continue
+        pairs[(lang1, lang2)] = load_pair(path, lang1, lang2)
+
+    # Every distinct text is tokenized once per language; the counts are
+    # over the distinct texts, so a verse shared by several pairs isn't
+    # counted once per pair
+    tokens = {}
+    counts = Counter()
+    with METRICS.timer("tokenize_seconds"):
+        for (lang1, lang2), df in pairs.items():
+            for language in (lang1, lang2):
+                seen = tokens.setdefault(language, {})
+                for text in df[language].unique():
+                    if text not in seen:
+                        seen[text] = tokenize(text) if text != NO_VERSE else []
+                        counts.update(seen[text])
+
+    vocab = Vocab.build(counts)
+    os.makedirs(output_dir, exist_ok=True)
+    vocab.save(Path(output_dir) / VOCAB_FILE)
+    print(f"Vocabulary: {len(vocab)} tokens ({len(counts)} distinct before cut-offs)")
+
+    encoded = {language: {} for language in tokens}
+    for (lang1, lang2), df in pairs.items():
+        if skip_missing:
+            df = df[(df[lang1] != NO_VERSE) & (df[lang2] != NO_VERSE)]
+        keys = add_verse_keys(df[["Book", "Chapter", "Verse"]])["key"].to_numpy()
+
+        sequences = {}
+        for language in (lang1, lang2):
+            cache = encoded[language]
+            for text in df[language].unique():
+                if text not in cache:
+                    cache[text] = vocab.encode(tokens[language][text])
+            sequences[language] = [cache[text] for text in df[language]]
+
+        pair_dir = Path(output_dir) / f"{lang1}_{lang2}"
+        pair_dir.mkdir(parents=True, exist_ok=True)
+        for stale in pair_dir.glob(SHARD_GLOB):
+            stale.unlink()
+
+        written = 0
+        with METRICS.timer("write_seconds", table=f"{lang1}-{lang2} binary"):
+            for shard, start in enumerate(range(0, max(len(df), 1), shard_examples)):
+                end = start + shard_examples
+                written += write_shard(
+                    pair_dir / f"shard-{shard:05d}.bin",
+                    (lang1, lang2),
+                    keys[start:end],
+                    {language: seqs[start:end] for language, seqs in sequences.items()},
+                    vocab,
+                )
+        METRICS.inc("rows_written", len(df), table=f"{lang1}-{lang2} binary")
+        METRICS.inc("bytes_written", written, table=f"{lang1}-{lang2} binary")
+        print(f"Saved: {pair_dir} ({len(df)} examples, {written / 1024 / 1024:.1f} MB)")
+
+
+class Shard:
+    """
+    One memory-mapped shard file. Arrays are views into the mapping, so
+    opening a shard reads only its header.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            head = f.read(HEADER_BYTES)
+        if not head.startswith(MAGIC):
+            raise ValueError(f"{self.path} is not a corpus shard")
+        self.meta = json.loads(head[len(MAGIC):].decode("utf-8"))
+        self.languages = self.meta["languages"]
+
+        buffer = np.memmap(self.path, dtype=np.uint8, mode="r")
+        self.arrays = {}
+        for name, spec in self.meta["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            start = spec["offset"]
+            self.arrays[name] = buffer[start : start + spec["length"] * dtype.itemsize].view(dtype)
+
+    def __len__(self):
+        return self.meta["examples"]
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        example = {"key": int(self.arrays["keys"][i])}
+        for language in self.languages:
+            offsets = self.arrays[f"{language}_offsets"]
+            example[language] = self.arrays[f"{language}_tokens"][offsets[i] : offsets[i + 1]]
+        return example
+
+    def lengths(self, language):
+        return np.diff(self.arrays[f"{language}_offsets"])
+
+
+class BinaryCorpus:
+    """
+    Random access to an exported pair: corpus[i] is {"key": verse key,
+    lang1: token ids, lang2: token ids}, the ids being zero-copy views of
+    the shard files. Decode them with corpus.vocab.
+    """
+
+    def __init__(self, pair_dir, vocab_path=None):
+        pair_dir = Path(pair_dir)
+        self.shards = [Shard(path) for path in sorted(pair_dir.glob(SHARD_GLOB))]
+        if not self.shards:
+            raise FileNotFoundError(f"No shards in {pair_dir}")
+        self.languages = self.shards[0].languages
+        self.starts = [0]
+        for shard in self.shards:
+            self.starts.append(self.starts[-1] + len(shard))
+        self.vocab = Vocab.load(vocab_path or pair_dir.parent / VOCAB_FILE)
+        if any(shard.meta["vocab_size"] != len(self.vocab) for shard in self.shards):
+            # Exporting a different set of pairs rebuilds vocab.txt
+            raise ValueError(f"{pair_dir} was exported with another vocabulary; export it again")
+
+    def __len__(self):
+        return self.starts[-1]
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        shard = bisect_right(self.starts, i) - 1
+        return self.shards[shard][i - self.starts[shard]]
+
+    def __iter__(self):
+        for shard in self.shards:
+            for i in range(len(shard)):
+                yield shard[i]
+
+    def lengths(self, language):
+        """
+        Token count of every example on one side, e.g. for length bucketing.
+        """
+        return np.concatenate([shard.lengths(language) for shard in self.shards])
+
+
+if __name__ == "__main__":
+    export_binary()
@@ -0,0 +1,85 @@
+import json
+import re
+
+import httpx
+
+# Markup data_cleaning.py extracts verses from; a page without it didn't
+# render the chapter server-side.
+CONTENT_MARKER = 'class="ChapterContent_content__RrUqA"'
+
+NEXT_DATA_RE = re.compile(
+    r'<script id="__NEXT_DATA__" type="application/json"[^>]*>(.*?)</script>',
+    re.DOTALL,
+)
+
+
+def make_client(user_agent, max_connections, timeout=30.0):
+    """
+    Pooled keep-alive client shared by every worker of a run, so chapters
+    from the same host reuse connections instead of paying a TLS handshake
+    each.
+    """
+    return httpx.AsyncClient(
+        headers={"User-Agent": user_agent},
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        ),
+        timeout=timeout,
+        follow_redirects=True,
+    )
+
+
+def extract_embedded_data(html):
+    """
+    Return the page-data JSON embedded by the site's renderer, or None.
+    """
+    match = NEXT_DATA_RE.search(html)
+    if not match:
+        return None
+    try:
+        return json.loads(match.group(1))
+    except ValueError:
+        return None
+
+
+def find_chapter_markup(data):
+    """
+    Walk embedded page data for the first string holding chapter markup.
+    """
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, str):
+            if CONTENT_MARKER in node:
+                return node
+        elif isinstance(node, dict):
+            stack.extend(reversed(list(node.values())))
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+    return None
+
+
+def extract_chapter(html):
+    """
+    Return chapter HTML usable by data_cleaning.py, or None if the page
+    needs a browser to render it.
+    """
+    if CONTENT_MARKER in html:
+        return html
+
+    data = extract_embedded_data(html)
+    if data is not None:
+        return find_chapter_markup(data)
+    return None
+
+
+async def fetch_chapter(client, url):
+    """
+    Fetch a chapter without a browser. Returns (status, html); html is None
+    when the response was fine but the chapter isn't in the served page.
+    """
+    resp = await client.get(url)
+    if resp.status_code != 200:
+        return resp.status_code, None
+    return resp.status_code, extract_chapter(resp.text)
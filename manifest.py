@@ -0,0 +1,126 @@
+import hashlib
+import os
+import sqlite3
+import time
+
+MANIFEST_PATH = "scrape-manifest.sqlite"
+MIN_HTML_LENGTH = 100  # Arbitrary minimum length for a usable chapter page
+
+
+class Manifest:
+    """
+    Persistent record of every chapter fetch, keyed by chapter URL.
+
+    A chapter counts as valid when its last fetch succeeded and the saved
+    file still has the recorded size, so reruns skip it. Failed fetches and
+    files that were truncated or deleted since are fetched again. With a
+    RawStore, sizes are checked against the store's index instead of files.
+    """
+
+    def __init__(self, path=MANIFEST_PATH, store=None):
+        self.store = store
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chapters (
+                url TEXT PRIMARY KEY,
+                label TEXT,
+                save_path TEXT,
+                status TEXT,
+                http_status INTEGER,
+                bytes INTEGER,
+                sha256 TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                updated_at REAL
+            )
+            """
+        )
+        self.conn.commit()
+
+    def get(self, url):
+        return self.conn.execute(
+            "SELECT * FROM chapters WHERE url = ?", (url,)
+        ).fetchone()
+
+    def saved_size(self, job):
+        """
+        Size of the stored copy of a chapter, or None if there isn't one.
+        """
+        if self.store is not None:
+            info = self.store.info(job["label"])
+            return info["raw_size"] if info is not None else None
+        path = job["save_path"]
+        return os.path.getsize(path) if os.path.exists(path) else None
+
+    def is_valid(self, job):
+        row = self.get(job["url"])
+        size = self.saved_size(job)
+
+        if row is None:
+            # Pages saved before the manifest existed are adopted as-is
+            # instead of being downloaded again.
+            if size is not None and size >= MIN_HTML_LENGTH:
+                if self.store is not None:
+                    html = self.store.get(job["label"])
+                else:
+                    with open(job["save_path"], "r", encoding="utf-8") as f:
+                        html = f.read()
+                self.record_success(job, None, html)
+                return True
+            return False
+
+        if row["status"] != "ok":
+            return False
+        return size == row["bytes"]
+
+    def record_success(self, job, http_status, html):
+        digest = hashlib.sha256(html.encode("utf-8")).hexdigest()
+        self._upsert(job, "ok", http_status, self.saved_size(job), digest, None)
+
+    def record_failure(self, job, http_status, error):
+        self._upsert(job, "failed", http_status, None, None, error)
+
+    def _upsert(self, job, status, http_status, size, digest, error):
+        self.conn.execute(
+            """
+            INSERT INTO chapters
+                (url, label, save_path, status, http_status, bytes, sha256, attempts, error, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                label = excluded.label,
+                save_path = excluded.save_path,
+                status = excluded.status,
+                http_status = excluded.http_status,
+                bytes = excluded.bytes,
+                sha256 = excluded.sha256,
+                attempts = chapters.attempts + 1,
+                error = excluded.error,
+                updated_at = excluded.updated_at
+            """,
+            (
+                job["url"],
+                job["label"],
+                job["save_path"],
+                status,
+                http_status,
+                size,
+                digest,
+                error,
+                time.time(),
+            ),
+        )
+        self.conn.commit()
+
+    def counts(self):
+        return dict(
+            self.conn.execute(
+                "SELECT status, COUNT(*) FROM chapters GROUP BY status"
+            ).fetchall()
+        )
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,317 @@
+import bisect
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+METRICS_DIR = "metrics"
+# "jsonl" appends every series to metrics/metrics.jsonl when a stage ends,
+# "prometheus" rewrites metrics/{stage}.prom for node_exporter's textfile
+# collector, "both" does both and None only keeps them in memory
+METRICS_FORMAT = "both"
+PREFIX = "nlp_"
+PROFILE = False  # write metrics/{stage}.prof with cProfile for every stage
+# Off by default: timing every regex rule in RulePipeline.apply costs two
+# clock reads per rule and page. Set it to get rule_seconds{rule=...}.
+RULE_TIMING = False
+PROGRESS_INTERVAL = 10  # seconds between progress lines on long loops
+
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BYTES_BUCKETS = (1_000, 10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 5_000_000)
+
+
+class Histogram:
+    def __init__(self, buckets=SECONDS_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """
+        Upper bound of the bucket holding the q-quantile.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Metrics:
+    """
+    Counters and histograms keyed by name and labels, shared by the scrape,
+    segmentation and alignment stages.
+
+    Worker processes record into their own registry; snapshot() and merge()
+    carry those numbers back to the parent (see collected()).
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=SECONDS_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(buckets)
+        histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def value(self, name, **labels):
+        return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def total(self, name):
+        """
+        A counter summed over all of its label sets.
+        """
+        return sum(v for (n, _), v in self.counters.items() if n == name)
+
+    def snapshot(self):
+        return {
+            "counters": [[name, dict(labels), value] for (name, labels), value in self.counters.items()],
+            "histograms": [
+                [name, dict(labels), list(h.buckets), h.counts, h.sum, h.count]
+                for (name, labels), h in self.histograms.items()
+            ],
+        }
+
+    def merge(self, snapshot):
+        for name, labels, value in snapshot["counters"]:
+            self.inc(name, value, **labels)
+        for name, labels, buckets, counts, total, count in snapshot["histograms"]:
+            key = (name, tuple(sorted(labels.items())))
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.counts = [a + b for a, b in zip(histogram.counts, counts)]
+            histogram.sum += total
+            histogram.count += count
+
+    def reset(self):
+        self.counters.clear()
+        self.histograms.clear()
+
+    def copy(self):
+        other = Metrics()
+        other.merge(self.snapshot())
+        return other
+
+    def since(self, baseline):
+        """
+        What was recorded after `baseline` (an earlier copy()) was taken.
+        """
+        recorded = Metrics()
+        for key, value in self.counters.items():
+            if value != baseline.counters.get(key, 0):
+                recorded.counters[key] = value - baseline.counters.get(key, 0)
+        for key, h in self.histograms.items():
+            before = baseline.histograms.get(key)
+            if before is None:
+                before = Histogram(h.buckets)
+            if h.count == before.count:
+                continue
+            delta = recorded.histograms[key] = Histogram(h.buckets)
+            delta.counts = [a - b for a, b in zip(h.counts, before.counts)]
+            delta.sum = h.sum - before.sum
+            delta.count = h.count - before.count
+        return recorded
+
+    def write_jsonl(self, path, stage):
+        now = time.time()
+        with open(path, "a", encoding="utf-8") as f:
+            for (name, labels), value in sorted(self.counters.items()):
+                f.write(json.dumps({
+                    "ts": now, "stage": stage, "type": "counter",
+                    "name": name, "labels": dict(labels), "value": value,
+                }) + "\n")
+            for (name, labels), h in sorted(self.histograms.items()):
+                f.write(json.dumps({
+                    "ts": now, "stage": stage, "type": "histogram",
+                    "name": name, "labels": dict(labels),
+                    "count": h.count, "sum": round(h.sum, 6),
+                    "buckets": dict(zip(map(str, h.buckets + ("+Inf",)), cumulative(h.counts))),
+                }) + "\n")
+
+    def write_prometheus(self, path):
+        """
+        Prometheus text exposition format, replaced atomically so the
+        textfile collector never reads half a file.
+        """
+        lines = []
+        typed = set()
+        for (name, labels), value in sorted(self.counters.items()):
+            metric = f"{PREFIX}{name}_total"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} counter")
+                typed.add(metric)
+            lines.append(f"{metric}{format_labels(labels)} {value}")
+        for (name, labels), h in sorted(self.histograms.items()):
+            metric = f"{PREFIX}{name}"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} histogram")
+                typed.add(metric)
+            for bound, count in zip(h.buckets + ("+Inf",), cumulative(h.counts)):
+                lines.append(f"{metric}_bucket{format_labels(labels + (('le', str(bound)),))} {count}")
+            lines.append(f"{metric}_sum{format_labels(labels)} {h.sum}")
+            lines.append(f"{metric}_count{format_labels(labels)} {h.count}")
+
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp, path)
+
+    def summary_lines(self):
+        """
+        One readable line per counter and histogram, for logs and emails.
+        """
+        lines = []
+        for (name, labels), value in sorted(self.counters.items()):
+            lines.append(f"{name}{format_labels(labels)}: {value}")
+        for (name, labels), h in sorted(self.histograms.items()):
+            mean = h.sum / h.count if h.count else 0.0
+            lines.append(
+                f"{name}{format_labels(labels)}: n={h.count} mean={mean:.4g} "
+                f"p95<={h.quantile(0.95):g} sum={h.sum:.4g}"
+            )
+        return lines
+
+
+def cumulative(counts):
+    total = 0
+    out = []
+    for n in counts:
+        total += n
+        out.append(total)
+    return out
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+METRICS = Metrics()
+
+# What each stage recorded in this process, summed over its runs; a
+# stage's .prom file holds only these series, so the textfile collector
+# never sees one series in two files
+STAGE_METRICS = {}
+# METRICS as it was when each running stage started, innermost last
+_stage_baselines = []
+
+
+def collected(fn, *args):
+    """
+    Run fn in a worker process and return (result, the metrics it
+    recorded) so the parent can merge() them.
+    """
+    METRICS.reset()
+    result = fn(*args)
+    return result, METRICS.snapshot()
+
+
+@contextmanager
+def stage(name, profile=None):
+    """
+    Time a pipeline stage, optionally under cProfile (metrics/{name}.prof
+    plus the top functions printed), and flush what it recorded when it
+    ends. Only this process is profiled; pool workers are not.
+    """
+    if profile is None:
+        profile = PROFILE
+    profiler = cProfile.Profile() if profile else None
+    baseline = METRICS.copy()
+    _stage_baselines.append(baseline)
+    start = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield METRICS
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        METRICS.observe("stage_seconds", time.perf_counter() - start, stage=name)
+        recorded = METRICS.since(baseline)
+        _stage_baselines.pop()
+        # An enclosing stage doesn't report what this one already has
+        for outer in _stage_baselines:
+            outer.merge(recorded.snapshot())
+        totals = STAGE_METRICS.setdefault(name, Metrics())
+        totals.merge(recorded.snapshot())
+        if profiler is not None:
+            Path(METRICS_DIR).mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(Path(METRICS_DIR) / f"{name}.prof")
+            report = io.StringIO()
+            pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(15)
+            print(report.getvalue())
+        flush_stage(name, recorded, totals)
+
+
+def flush_stage(name, recorded, totals, out_dir=None, output_format=None):
+    """
+    Append what this run of the stage recorded to metrics.jsonl and
+    rewrite {name}.prom with the stage's totals so far.
+    """
+    # Settings are read at call time so callers can switch output off
+    out_dir = out_dir or METRICS_DIR
+    output_format = output_format or METRICS_FORMAT
+    if output_format is None:
+        return
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    if output_format in ("jsonl", "both"):
+        recorded.write_jsonl(Path(out_dir) / "metrics.jsonl", name)
+    if output_format in ("prometheus", "both"):
+        totals.write_prometheus(Path(out_dir) / f"{name}.prom")
+
+
+class Progress:
+    """
+    Replaces a print per item with one line every PROGRESS_INTERVAL seconds.
+    """
+
+    def __init__(self, label, total=None, interval=PROGRESS_INTERVAL):
+        self.label = label
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.started = self.last = time.perf_counter()
+
+    def update(self, n=1, detail=""):
+        self.done += n
+        now = time.perf_counter()
+        if now - self.last >= self.interval or self.done == self.total:
+            self.last = now
+            of = f"/{self.total}" if self.total is not None else ""
+            rate = self.done / (now - self.started) if now > self.started else 0.0
+            print(f"{self.label}: {self.done}{of} ({rate:.1f}/s){' ' + detail if detail else ''}", flush=True)
@@ -1,7 +1,15 @@
 import pandas as pd
 from pathlib import Path
+import multiprocessing
 import os
 import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import metrics
+from columnar import PARQUET_SUFFIX, ParquetAppender, iter_row_groups, read_parquet, write_parquet
+from metrics import METRICS, collected
+from verse_keys import KEY_COLUMNS, add_verse_keys, book_ids, chapter_of, pack_keys
 
 def parse_verse_range(verse_str):
     """
@@ -50,208 +58,650 @@ def consolidate_verses(df):
     
     return verse_map
 
+def explode_ranges(df):
+    """
+    One row per verse covered by each verse range in df, in the order
+    consolidate_verses would visit them: (Book, Chapter) groups sorted, ranges
+    in order of first appearance, verses ascending. range_id numbers the
+    ranges in that order.
+    """
+    verses = df[['Book', 'Chapter', 'Verse']].dropna()
+    verses = verses.drop_duplicates().sort_values(['Book', 'Chapter'], kind='stable')
+
+    # Parse each distinct label once instead of once per row
+    unique_labels = verses['Verse'].unique()
+    parsed = pd.Series(
+        [sorted(parse_verse_range(v)) for v in unique_labels], index=unique_labels
+    )
+    nums = verses['Verse'].map(parsed)
+    is_range = nums.map(len) > 1
+    ranges = verses[is_range].assign(num=nums[is_range]).reset_index(drop=True)
+    ranges['range_id'] = range(len(ranges))
+
+    exploded = ranges.explode('num', ignore_index=True)
+    exploded['lookup'] = exploded['num'].astype(int).astype(str)
+    return ranges, exploded
+
+def merge_ranges_into(ranges, exploded, target):
+    """
+    Replace target's individual verses covered by each range with a single
+    row labelled with the range, texts joined in verse order. A verse is
+    consumed by the first range that covers it; verses a range can't find
+    become '<missing verse>'. Ranges that find none of their verses are
+    skipped.
+    """
+    if ranges.empty:
+        return target.copy()
+
+    text_col = target.columns[-1]
+
+    # Lookups match the label exactly, so only string labels can be found;
+    # the first row wins if a verse appears more than once.
+    is_str = target['Verse'].map(lambda v: isinstance(v, str)).astype(bool)
+    first = target.loc[is_str, ['Book', 'Chapter', 'Verse', text_col]].drop_duplicates(
+        ['Book', 'Chapter', 'Verse'], keep='first'
+    )
+    first = first.rename(columns={'Verse': 'lookup', text_col: '_text'})
+
+    pieces = exploded.merge(first, on=['Book', 'Chapter', 'lookup'], how='left', indicator=True)
+    found = pieces['_merge'] == 'both'
+    claimed = found & ~pieces[found].duplicated(['Book', 'Chapter', 'lookup']).reindex(
+        pieces.index, fill_value=True
+    )
+
+    text = pieces['_text'].map(str)
+    valid = ~text.str.lower().isin(['nan', 'none', ''])
+    pieces['piece'] = '<missing verse>'
+    pieces.loc[claimed & valid, 'piece'] = text[claimed & valid].str.strip()
+    pieces['claimed'] = claimed
+
+    per_range = pieces.groupby('range_id', sort=True).agg(
+        text=('piece', ' '.join), claimed=('claimed', 'any')
+    )
+    keep = per_range.index[per_range['claimed']]
+    if len(keep) == 0:
+        return target.copy()
+
+    # Drop every row (duplicates included) of each consumed verse
+    removed = pieces.loc[claimed, ['Book', 'Chapter', 'lookup']]
+    removed_keys = pd.MultiIndex.from_frame(removed)
+    target_keys = pd.MultiIndex.from_arrays(
+        [target['Book'], target['Chapter'], target['Verse'].astype(str)]
+    )
+    aligned = target[~target_keys.isin(removed_keys)]
+
+    new_rows = ranges.loc[keep, ['Book', 'Chapter', 'Verse']].copy()
+    new_rows[text_col] = per_range.loc[keep, 'text'].values
+    new_rows = pd.DataFrame(new_rows.to_dict('records'))
+    return pd.concat([aligned, new_rows], ignore_index=True)
+
 def align_verses_for_merge(df1, df2):
     """
     Align two dataframes by handling verse ranges.
     If df1 has "1-4" and df2 has individual verses 1,2,3,4,
     concatenate df2's verses to create a "1-4" row.
+
+    Ranges are exploded into one row per covered verse and joined against
+    the other side in bulk, instead of filtering the whole frame per verse.
     """
-    # Find verse ranges in each dataframe
-    ranges1 = consolidate_verses(df1)
-    ranges2 = consolidate_verses(df2)
-    
-    df1_aligned = df1.copy()
-    df2_aligned = df2.copy()
-    
-    # Process df1's ranges: concatenate matching verses from df2
-    for (book, chapter, verse_range), verse_nums in ranges1.items():
-        text_col = df2_aligned.columns[-1]  
-        texts = []
-        verses_to_remove = []
-        
-        # Check each verse in the range individually
-        for v in verse_nums:
-            matching_verse = df2_aligned[
-                (df2_aligned['Book'] == book) & 
-                (df2_aligned['Chapter'] == chapter) & 
-                (df2_aligned['Verse'] == str(v))
-            ]
-            
-            if len(matching_verse) > 0:
-                text = str(matching_verse[text_col].iloc[0])
-                # Handle empty, NaN, or missing content
-                if text and text.lower() not in ['nan', 'none', '']:
-                    texts.append(text.strip())
-                else:
-                    texts.append('<missing verse>')
-                verses_to_remove.append(str(v))
-            else:
-                texts.append('<missing verse>')
-        
-        if verses_to_remove:
-            concatenated_text = ' '.join(texts)
-            
-            # Remove individual verse rows from df2
-            df2_aligned = df2_aligned[~(
-                (df2_aligned['Book'] == book) & 
-                (df2_aligned['Chapter'] == chapter) & 
-                (df2_aligned['Verse'].astype(str).isin(verses_to_remove))
-            )]
-            
-            # Add the concatenated row
-            new_row = {
-                'Book': book,
-                'Chapter': chapter,
-                'Verse': verse_range,
-                text_col: concatenated_text
-            }
-            df2_aligned = pd.concat([df2_aligned, pd.DataFrame([new_row])], ignore_index=True)
-    
-    # Process df2's ranges: concatenate matching verses from df1
-    for (book, chapter, verse_range), verse_nums in ranges2.items():
-        text_col = df1_aligned.columns[-1]  # Last column is the text
-        texts = []
-        verses_to_remove = []
-        
-        # Check each verse in the range individually
-        for v in verse_nums:
-            matching_verse = df1_aligned[
-                (df1_aligned['Book'] == book) & 
-                (df1_aligned['Chapter'] == chapter) & 
-                (df1_aligned['Verse'] == str(v))
-            ]
-            
-            if len(matching_verse) > 0:
-                text = str(matching_verse[text_col].iloc[0])
-                # Handle empty, NaN, or missing content
-                if text and text.lower() not in ['nan', 'none', '']:
-                    texts.append(text.strip())
-                else:
-                    texts.append('<missing verse>')
-                verses_to_remove.append(str(v))
-            else:
-                texts.append('<missing verse>')
-        
-        if verses_to_remove:
-            concatenated_text = ' '.join(texts)
-            
-            # Remove individual verse rows from df1
-            df1_aligned = df1_aligned[~(
-                (df1_aligned['Book'] == book) & 
-                (df1_aligned['Chapter'] == chapter) & 
-                (df1_aligned['Verse'].astype(str).isin(verses_to_remove))
-            )]
-            
-            # Add the concatenated row
-            new_row = {
-                'Book': book,
-                'Chapter': chapter,
-                'Verse': verse_range,
-                text_col: concatenated_text
-            }
-            df1_aligned = pd.concat([df1_aligned, pd.DataFrame([new_row])], ignore_index=True)
-    
+    ranges1, exploded1 = explode_ranges(df1)
+    ranges2, exploded2 = explode_ranges(df2)
+
+    # df1's ranges pull verses from df2 and vice versa; both use the ranges
+    # of the frames as given
+    df2_aligned = merge_ranges_into(ranges1, exploded1, df2)
+    df1_aligned = merge_ranges_into(ranges2, exploded2, df1)
+
     return df1_aligned, df2_aligned
 
-def create_parallel_corpus():
-    # Define the language pairs to create
-    language_pairs = [
-        ("English", "Bikolano"),
-        ("English", "Cebuano"), 
-        ("English", "Spanish"),
-        ("English", "Ilokano"),
-        ("Cebuano", "Bikolano"),
-        ("Cebuano", "Spanish"),
-        ("Cebuano", "Ilokano")
-    ]
-    
+def stack_languages(language_data, languages):
+    """
+    All languages in one long frame: Book, Chapter, Verse, Text, lang, the
+    integer verse key columns and the row's original position.
+    """
+    frames = []
+    for lang in languages:
+        df = language_data[lang]
+        frames.append(pd.DataFrame({
+            'Book': df['Book'],
+            'Chapter': df['Chapter'],
+            'Verse': df['Verse'],
+            'Text': df[df.columns[-1]],
+            'lang': lang,
+        }))
+    long = add_verse_keys(pd.concat(frames, ignore_index=True))
+    long['order'] = range(len(long))
+    return long
+
+def assign_spans(parsed):
+    """
+    Number the canonical spans of each chapter: a span is a maximal run of
+    verse labels whose ranges overlap in any language, so "1-4" in one
+    language and 1, 2, 3, 4 in another land in the same span.
+    """
+    parsed = parsed.sort_values(['key', 'order'], kind='stable').reset_index(drop=True)
+    chapters = chapter_of(parsed['key'])
+    reach = parsed.groupby(chapters, sort=False)['verse_end'].cummax()
+    prev_reach = reach.groupby(chapters, sort=False).shift()
+    new_span = prev_reach.isna() | (parsed['verse_start'] > prev_reach)
+    parsed['span'] = new_span.cumsum() - 1
+    return parsed
+
+def fill_span(rows, span_start, span_end):
+    """
+    Text of one language over a span it covers only partly (or with
+    overlapping labels): its pieces in verse order, '<missing verse>' for
+    every verse none of its labels covers.
+    """
+    pieces = []
+    covered_to = span_start - 1
+    by_start = rows.groupby('verse_start', sort=True)['piece'].apply(list)
+    ends = rows.groupby('verse_start', sort=True)['verse_end'].max()
+    for v in range(int(span_start), int(span_end) + 1):
+        if v in by_start.index:
+            pieces.extend(by_start[v])
+            covered_to = max(covered_to, ends[v])
+        elif v > covered_to:
+            pieces.append('<missing verse>')
+    return ' '.join(pieces)
+
+def span_texts(parsed, spans):
+    """
+    One text per (span, lang). A language whose only label is the span
+    itself keeps its text as-is, like a plain pairwise merge; otherwise the
+    texts of its labels are joined in verse order the same way
+    align_verses_for_merge joins a range.
+    """
+    rows = parsed.drop_duplicates(['key', 'lang'], keep='first').copy()
+
+    text = rows['Text'].map(str)
+    valid = ~text.str.lower().isin(['nan', 'none', ''])
+    rows['piece'] = '<missing verse>'
+    rows.loc[valid, 'piece'] = text[valid].str.strip()
+
+    rows['width'] = rows['verse_end'] - rows['verse_start'] + 1
+    prev_end = rows.groupby(['span', 'lang'], sort=False)['verse_end'].shift()
+    rows['overlaps'] = rows['verse_start'] <= prev_end
+
+    groups = rows.groupby(['span', 'lang'], sort=False)
+    per_lang = groups.agg(
+        n=('piece', 'size'),
+        width=('width', 'sum'),
+        overlaps=('overlaps', 'any'),
+        first_key=('key', 'first'),
+        raw=('Text', 'first'),
+    )
+    # A groupby(...).agg(' '.join) slices a Series per group; collecting the
+    # pieces in plain lists is much cheaper. Only languages with more than
+    # one label in a span need joining, and rows are already in verse order.
+    multi = rows[groups['piece'].transform('size') > 1]
+    pieces = {}
+    for key, piece in zip(zip(multi['span'], multi['lang']), multi['piece']):
+        pieces.setdefault(key, []).append(piece)
+    joined = pd.Series({key: ' '.join(parts) for key, parts in pieces.items()}, dtype=object)
+    per_lang['joined'] = joined.reindex(per_lang.index)
+
+    span_of = per_lang.index.get_level_values('span')
+    span_key = spans['key'].reindex(span_of).values
+    span_width = (spans['verse_end'] - spans['verse_start'] + 1).reindex(span_of).values
+
+    exact = (per_lang['n'] == 1) & (per_lang['first_key'] == span_key)
+    complete = ~per_lang['overlaps'] & (per_lang['width'] == span_width)
+
+    texts = per_lang['joined'].astype(object).where(complete, None)
+    texts.loc[exact] = per_lang.loc[exact, 'raw'].fillna('<no verse>')
+    partial = per_lang.index[~exact & ~complete]
+    if len(partial):
+        partial_rows = rows.set_index(['span', 'lang']).loc[partial].reset_index()
+        for key, group in partial_rows.groupby(['span', 'lang'], sort=False):
+            span = spans.loc[key[0]]
+            texts.loc[key] = fill_span(group, span['verse_start'], span['verse_end'])
+    return texts
+
+def build_canonical_table(language_data, languages=None):
+    """
+    Map every language onto one canonical (Book, Chapter, Verse) index in a
+    single pass and return the wide table: one row per verse span, one text
+    column per language, indexed and ordered by the span's packed verse key
+    (see verse_keys), so books come out in biblical order.
+
+    Spans are the union of overlapping verse labels across all languages,
+    so a span can be coarser than any single pair would need: if only
+    Spanish merges 1-4, every language's verses 1..4 become one "1-4" row.
+    A language with no text in a span gets '<no verse>'; verses missing
+    inside a span it partly covers become '<missing verse>'. Labels that
+    aren't verse numbers keep their own rows.
+    """
+    languages = list(languages or language_data)
+    long = stack_languages(language_data, languages)
+    numbered = long['verse_start'] > 0
+
+    parsed = assign_spans(long[numbered])
+    spans = parsed.groupby('span').agg(
+        Book=('Book', 'first'),
+        Chapter=('Chapter', 'first'),
+        book_id=('book_id', 'first'),
+        chapter_num=('chapter_num', 'first'),
+        verse_start=('verse_start', 'min'),
+        verse_end=('verse_end', 'max'),
+    )
+    spans['key'] = pack_keys(*(spans[col] for col in KEY_COLUMNS))
+    start = spans['verse_start'].astype(str)
+    end = spans['verse_end'].astype(str)
+    spans['Verse'] = start.where(spans['verse_start'] == spans['verse_end'], start + '-' + end)
+
+    texts = span_texts(parsed, spans).unstack('lang')
+    wide = spans.join(texts).set_index('key')
+
+    # Unparseable labels only line up with the identical label elsewhere,
+    # which is exactly what their key encodes
+    other = long[~numbered].drop_duplicates(['key', 'lang'], keep='first')
+    if not other.empty:
+        labels = other.drop_duplicates('key').set_index('key')[['Book', 'Chapter', 'Verse']]
+        other_wide = labels.join(other.pivot(index='key', columns='lang', values='Text'))
+        wide = pd.concat([wide, other_wide])
+
+    wide = wide.sort_index().reindex(columns=['Book', 'Chapter', 'Verse'] + languages)
+    wide[languages] = wide[languages].fillna('<no verse>')
+    return wide
+
+def project_languages(wide, languages):
+    """
+    A parallel corpus for any subset of languages, cut from the wide table:
+    the subset's columns, minus spans where none of them has a verse.
+    """
+    languages = list(languages)
+    present = (wide[languages] != '<no verse>').any(axis=1)
+    return wide.loc[present, ['Book', 'Chapter', 'Verse'] + languages]
+
+LANGUAGE_PAIRS = [
+    ("English", "Bikolano"),
+    ("English", "Cebuano"),
+    ("English", "Spanish"),
+    ("English", "Ilokano"),
+    ("Cebuano", "Bikolano"),
+    ("Cebuano", "Spanish"),
+    ("Cebuano", "Ilokano")
+]
+
+# How each pair's verses are merged; both modes align every pair on its
+# own, from its two languages only, so a third language's merged verses
+# never coarsen a pair. "pairwise" uses align_verses_for_merge, which keeps
+# overlapping ranges (1-3 and 2-4) as separate rows. "nway" runs
+# build_canonical_table on the pair, which merges them into one 1-4 span.
+# Neither reuses the All_Languages_Parallel table: projecting the pairs
+# from it would give them its coarser spans.
+CORPUS_MODE = "pairwise"
+
+# Also write All_Languages_Parallel: every language on one shared verse
+# index. Its spans are the union of overlapping verse ranges across all
+# languages, so it is coarser than the pair files.
+ALL_LANGUAGES = False
+
+# "tsv", or "parquet" for typed, book-partitioned files (needs pyarrow)
+OUTPUT_FORMAT = "tsv"
+
+# Build one book at a time across all languages and append to the outputs,
+# so memory is bounded by the largest book instead of the whole corpus
+BUILD_BY_BOOK = False
+VERSE_COLUMNS = ['Book', 'Chapter', 'Verse', 'Text']
+CHUNK_ROWS = 20_000
+# Consecutive small books are built together up to this many verse rows
+# (all languages), which amortises pandas' per-call overhead; a larger book
+# is still built on its own
+BLOCK_ROWS = 20_000
+
+def find_language_files(verses_dir):
+    """
+    {language: path} for every Verses table. A language with both a TSV
+    and a Parquet table (from runs with different output formats) is read
+    from whichever was written last, with a warning.
+    """
+    candidates = {}
+    for path in sorted(Path(verses_dir).glob('**/*.tsv')) + sorted(Path(verses_dir).glob('**/*' + PARQUET_SUFFIX)):
+        filename = os.path.basename(str(path))
+        language = filename.replace("Bible_", "").replace(".tsv", "").replace(PARQUET_SUFFIX, "")
+        candidates.setdefault(language, []).append(path)
+
+    paths = {}
+    for language, found in candidates.items():
+        paths[language] = max(found, key=lambda path: path.stat().st_mtime_ns)
+        for other in found:
+            if other != paths[language]:
+                print(f"Warning: {language} has both {paths[language]} and an older {other}; using {paths[language].name}")
+    return paths
+
+def prepare_verses(df):
+    # Convert all merge columns to string
+    df['Book'] = df['Book'].astype(str)
+    df['Chapter'] = df['Chapter'].astype(str)
+    df['Verse'] = df['Verse'].astype(str)
+    return df
+
+def load_language_data(verses_dir="Verses", books=None):
+    """
+    Verse tables per language. A language saved as Parquet is read from
+    there, only its Book/Chapter/Verse/Text columns and, with `books`, only
+    those books' row groups; TSV files are parsed (and filtered) in full.
+    """
     language_data = {}
     
-    # Read TSV files
-    pathlist = Path("Verses").glob('**/*.tsv')
-    for path in pathlist:
+    # Read each language from its newest table, TSV or Parquet
+    for language, path in find_language_files(verses_dir).items():
         path_in_string = str(path)
-        print("Reading file:", path_in_string)
         
-        # Extract language
-        filename = os.path.basename(path_in_string)
-        language = filename.replace("Bible_", "").replace(".tsv", "")
+        if path.suffix == PARQUET_SUFFIX:
+            df = read_parquet(path, columns=VERSE_COLUMNS, books=books)
+        else:
+            with open(path_in_string, "r", encoding="utf-8") as language_file:
+                df = pd.read_csv(language_file, sep="\t")
+            if books is not None:
+                df = df[df['Book'].isin(list(books))]
         
-        # Read the TSV file
-        with open(path_in_string, "r", encoding="utf-8") as language_file:
-            df = pd.read_csv(language_file, sep="\t")
-            
-            # Convert all merge columns to string
-            df['Book'] = df['Book'].astype(str)
-            df['Chapter'] = df['Chapter'].astype(str)
-            df['Verse'] = df['Verse'].astype(str)
-            
-            language_data[language] = df
-            print(f"Loaded {len(df)} verses for {language}")
-            print(f"Sample data types - Book: {df['Book'].dtype}, Chapter: {df['Chapter'].dtype}, Verse: {df['Verse'].dtype}")
+        language_data[language] = prepare_verses(df)
+        METRICS.inc("verses_loaded", len(df), lang=language)
+        print(f"Loaded {len(df)} verses for {language}")
     
-    output_dir = "Parallel_Corpus"
-    os.makedirs(output_dir, exist_ok=True)
+    return language_data
+
+def create_pair_corpus(df1, df2, lang1, lang2):
+    verse_col1 = df1.columns[-1]
+    verse_col2 = df2.columns[-1]
+    pair = f"{lang1}-{lang2}"
     
-    # Create parallel corpora
+    # Align verses (handle merged verses by concatenating individual ones)
+    with METRICS.timer("align_seconds", pair=pair):
+        df1, df2 = align_verses_for_merge(df1, df2 )
+    
+    # Merge and sort on the packed integer verse key instead of three
+    # string columns; sorting by key also puts books in biblical order
+    start = time.perf_counter()
+    keyed1 = add_verse_keys(df1)
+    keyed2 = add_verse_keys(df2)
+    merged_df = pd.merge(
+        keyed1[['key', verse_col1]].rename(columns={verse_col1: lang1}),
+        keyed2[['key', verse_col2]].rename(columns={verse_col2: lang2}),
+        on='key',
+        how='outer',
+    )
+    labels = pd.concat([keyed1, keyed2])[['key', 'Book', 'Chapter', 'Verse']]
+    labels = labels.drop_duplicates('key').set_index('key')
+    
+    # Create the final output format
+    result_df = labels.reindex(merged_df['key'])
+    
+    # Handle missing verses
+    result_df[lang1] = merged_df[lang1].fillna('<no verse>').values
+    result_df[lang2] = merged_df[lang2].fillna('<no verse>').values
+    
+    result_df = result_df.sort_index(kind='stable')
+    METRICS.observe("merge_seconds", time.perf_counter() - start, pair=pair)
+    return result_df
+
+# Frames the pairs are cut from. Set once per process by init_pair_worker
+# so a pool task only carries the two language names; under fork the
+# workers inherit them copy-on-write instead of unpickling them at all.
+_pair_source = {}
+
+def init_pair_worker(language_data, mode):
+    _pair_source['language_data'] = language_data
+    _pair_source['mode'] = mode
+
+def pair_table(language_data, lang1, lang2, mode):
+    """
+    One pair's parallel rows, spans depending only on those two languages.
+    The pair is aligned here in either mode; "nway" only changes how
+    overlapping verse ranges are merged (see CORPUS_MODE).
+    """
+    if mode == "nway":
+        with METRICS.timer("align_seconds", pair=f"{lang1}-{lang2}"):
+            wide = build_canonical_table(language_data, [lang1, lang2])
+        return project_languages(wide, [lang1, lang2])
+    return create_pair_corpus(language_data[lang1], language_data[lang2], lang1, lang2)
+
+def write_corpus(df, out_filename):
+    if out_filename.endswith(PARQUET_SUFFIX):
+        write_parquet(df, out_filename)
+    else:
+        df.to_csv(out_filename, sep='\t', index=False)
+
+def write_pair(lang1, lang2, out_filename):
+    """
+    Build one pair from the frames set by init_pair_worker and write it.
+    The serial and the parallel path both go through here, so they write
+    identical files.
+    """
+    result_df = pair_table(_pair_source['language_data'], lang1, lang2, _pair_source['mode'])
+    with METRICS.timer("write_seconds", table="pair"):
+        write_corpus(result_df, out_filename)
+    METRICS.inc("rows_written", len(result_df), table=f"{lang1}-{lang2}")
+    return out_filename
+
+def pair_pool(workers, language_data, mode):
+    context = None
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=init_pair_worker,
+        initargs=(language_data, mode),
+    )
+
+def pair_tasks(language_pairs, languages, output_dir, suffix):
+    tasks = []
     for lang1, lang2 in language_pairs:
-        if lang1 in language_data and lang2 in language_data:
-            print(f"\nCreating parallel corpus: {lang1} - {lang2}")
-            
-            # Get the dataframes
-            df1 = language_data[lang1]
-            df2 = language_data[lang2]
-            
-            verse_col1 = df1.columns[-1]
-            verse_col2 = df2.columns[-1]
-            
-            print(f"Using column '{verse_col1}' for {lang1} and '{verse_col2}' for {lang2}")
-            
-            # Align verses (handle merged verses by concatenating individual ones)
-            print(f"Aligning verses between {lang1} and {lang2}...")
-            df1, df2 = align_verses_for_merge(df1, df2 )
-            
-            merged_df = pd.merge(
-                df1, 
-                df2, 
-                on=['Book', 'Chapter', 'Verse'], 
-                how='outer',
-                suffixes=(f'_{lang1}', f'_{lang2}')
-            )
-            
-            # Create the final output format
-            result_df = pd.DataFrame()
-            result_df['Book'] = merged_df['Book']
-            result_df['Chapter'] = merged_df['Chapter']
-            result_df['Verse'] = merged_df['Verse']
-            
-            # Handle missing verses
-            lang1_verse_col = f'{verse_col1}_{lang1}'
-            lang2_verse_col = f'{verse_col2}_{lang2}'
-            
-            result_df[lang1] = merged_df[lang1_verse_col].fillna('<no verse>')
-            result_df[lang2] = merged_df[lang2_verse_col].fillna('<no verse>')
-            
-            # Convert Chapter and Verse to numeric for sorting
-            result_df['Chapter_num'] = pd.to_numeric(result_df['Chapter'], errors='coerce')
-            result_df['Verse_num'] = pd.to_numeric(result_df['Verse'], errors='coerce')
-            
-            result_df = result_df.sort_values(['Book', 'Chapter_num', 'Verse_num']).reset_index(drop=True)
-            result_df = result_df.drop(['Chapter_num', 'Verse_num'], axis=1)
-            
-            # Save to TSV
-            out_filename = f"{output_dir}/{lang1}_{lang2}_Parallel.tsv"
-            result_df.to_csv(out_filename, sep='\t', index=False)
-            print(f"Saved: {out_filename}")
-            
+        if lang1 in languages and lang2 in languages:
+            tasks.append((lang1, lang2, f"{output_dir}/{lang1}_{lang2}_Parallel{suffix}"))
         else:
             missing_langs = []
-            if lang1 not in language_data:
+            if lang1 not in languages:
                 missing_langs.append(lang1)
-            if lang2 not in language_data:
+            if lang2 not in languages:
                 missing_langs.append(lang2)
             print(f"Warning: Missing data for {', '.join(missing_langs)}. Skipping {lang1}-{lang2} pair.")
+    return tasks
+
+@metrics.stage("parallel_corpus")
+def create_parallel_corpus(mode=CORPUS_MODE, language_pairs=LANGUAGE_PAIRS, verses_dir="Verses", output_dir="Parallel_Corpus", workers=None, output_format=OUTPUT_FORMAT, by_book=BUILD_BY_BOOK, all_languages=ALL_LANGUAGES):
+    if by_book:
+        return stream_parallel_corpus(mode, language_pairs, verses_dir, output_dir, output_format, all_languages)
+    
+    language_data = load_language_data(verses_dir)
+    suffix = PARQUET_SUFFIX if output_format == "parquet" else ".tsv"
+    
+    os.makedirs(output_dir, exist_ok=True)
+    
+    wide = None
+    if all_languages and language_data:
+        print(f"\nAligning {len(language_data)} languages onto one verse index...")
+        with METRICS.timer("align_seconds", pair="all"):
+            wide = build_canonical_table(language_data, sorted(language_data))
+    
+    # Create parallel corpora
+    tasks = pair_tasks(language_pairs, language_data, output_dir, suffix)
+    
+    if workers is None:
+        workers = min(len(tasks), os.cpu_count() or 1)
+    
+    def save_wide():
+        if wide is None:
+            return
+        out_filename = f"{output_dir}/All_Languages_Parallel{suffix}"
+        write_corpus(wide, out_filename)
+        METRICS.inc("rows_written", len(wide), table="all")
+        print(f"Saved: {out_filename} ({len(wide)} spans)")
+    
+    if workers <= 1:
+        init_pair_worker(language_data, mode)
+        save_wide()
+        for lang1, lang2, out_filename in tasks:
+            print(f"\nCreating parallel corpus: {lang1} - {lang2}")
+            print(f"Saved: {write_pair(lang1, lang2, out_filename)}")
+        return
+    
+    print(f"\nWriting {len(tasks)} parallel corpora with {workers} workers")
+    # The pool is shut down even if writing the wide table fails
+    with pair_pool(workers, language_data, mode) as executor:
+        # Each worker sends back the metrics it recorded for its pair
+        futures = [executor.submit(collected, write_pair, *task) for task in tasks]
+        # The wide table is written here while the pool works on the pairs
+        save_wide()
+        for future in futures:
+            out_filename, snapshot = future.result()
+            METRICS.merge(snapshot)
+            print(f"Saved: {out_filename}")
             
+class TsvAppender:
+    def __init__(self, out_filename, columns):
+        self.file = open(out_filename, "w", encoding="utf-8", newline="")
+        pd.DataFrame(columns=columns).to_csv(self.file, sep='\t', index=False)
+
+    def append(self, df):
+        df.to_csv(self.file, sep='\t', index=False, header=False)
+
+    def close(self):
+        self.file.close()
+
+def open_corpus_writer(out_filename, columns):
+    if out_filename.endswith(PARQUET_SUFFIX):
+        return ParquetAppender(out_filename, columns)
+    return TsvAppender(out_filename, columns)
+
+def iter_verse_chunks(path):
+    if path.suffix == PARQUET_SUFFIX:
+        return iter_row_groups(path, columns=VERSE_COLUMNS)
+    return pd.read_csv(
+        path, sep="\t", chunksize=CHUNK_ROWS,
+        dtype={'Book': str, 'Chapter': str, 'Verse': str},
+    )
+
+def iter_books(path):
+    """
+    Stream one language's verses as (book, frame) one book at a time. The
+    table must keep each book's rows together, as data_cleaning writes it.
+    """
+    current = None
+    pending = []
+    done = set()
+    for chunk in iter_verse_chunks(path):
+        chunk = prepare_verses(chunk)
+        book = chunk['Book']
+        starts = list((book != book.shift()).to_numpy().nonzero()[0]) + [len(chunk)]
+        for start, end in zip(starts, starts[1:]):
+            name = book.iat[start]
+            if name != current:
+                if current is not None:
+                    yield current, pd.concat(pending, ignore_index=True)
+                    done.add(current)
+                if name in done:
+                    raise ValueError(f"{path} is not grouped by book ({name} appears twice); rebuild it or use by_book=False")
+                current = name
+                pending = []
+            pending.append(chunk.iloc[start:end])
+    if current is not None:
+        yield current, pd.concat(pending, ignore_index=True)
+
+def book_rank(book):
+    return int(book_ids(pd.Series([book])).iat[0])
+
+def iter_book_partitions(paths):
+    """
+    Merge the per-language book streams: yields (book, {lang: frame}) in
+    canonical book order with every language that has that book, holding
+    at most one book per language in memory.
+    """
+    streams = {lang: iter_books(path) for lang, path in paths.items()}
+    heads = {}
+    for lang, stream in streams.items():
+        head = next(stream, None)
+        if head is not None:
+            heads[lang] = head
+    
+    while heads:
+        rank = min(book_rank(book) for book, _ in heads.values())
+        book = None
+        partition = {}
+        for lang in list(heads):
+            head_book, df = heads[lang]
+            if book_rank(head_book) != rank:
+                continue
+            book = head_book
+            partition[lang] = df
+            head = next(streams[lang], None)
+            if head is None:
+                del heads[lang]
+            elif book_rank(head[0]) <= rank:
+                raise ValueError(f"{paths[lang]} is not in canonical book order; rebuild it or use by_book=False")
+            else:
+                heads[lang] = head
+        yield book, partition
+
+def iter_book_blocks(paths, block_rows=BLOCK_ROWS):
+    """
+    Group consecutive book partitions into blocks of about block_rows rows:
+    yields (books, {lang: frame}).
+    """
+    books = []
+    block = {}
+    rows = 0
+    for book, partition in iter_book_partitions(paths):
+        books.append(book)
+        for lang, df in partition.items():
+            block.setdefault(lang, []).append(df)
+            rows += len(df)
+        if rows >= block_rows:
+            yield books, {lang: pd.concat(dfs, ignore_index=True) for lang, dfs in block.items()}
+            books, block, rows = [], {}, 0
+    if books:
+        yield books, {lang: pd.concat(dfs, ignore_index=True) for lang, dfs in block.items()}
+
+def stream_parallel_corpus(mode, language_pairs, verses_dir, output_dir, output_format, all_languages=ALL_LANGUAGES):
+    """
+    Same outputs as create_parallel_corpus, built a block of books at a
+    time: spans never cross a book and outputs are in canonical order, so
+    appending the blocks in order gives the rows the in-memory build
+    writes (Parquet files keep Chapter as text, see ParquetAppender).
+    """
+    paths = find_language_files(verses_dir)
+    languages = sorted(paths)
+    suffix = PARQUET_SUFFIX if output_format == "parquet" else ".tsv"
+    
+    os.makedirs(output_dir, exist_ok=True)
+    tasks = pair_tasks(language_pairs, paths, output_dir, suffix)
+    
+    wide_writer = None
+    if all_languages and languages:
+        wide_writer = open_corpus_writer(
+            f"{output_dir}/All_Languages_Parallel{suffix}", ['Book', 'Chapter', 'Verse'] + languages
+        )
+    writers = [
+        open_corpus_writer(out_filename, ['Book', 'Chapter', 'Verse', lang1, lang2])
+        for lang1, lang2, out_filename in tasks
+    ]
+    
+    empty = pd.DataFrame({col: pd.Series(dtype=str) for col in VERSE_COLUMNS})
+    for books, block in iter_book_blocks(paths):
+        print(f"Building {', '.join(books)} from {len(block)} languages")
+        frames = {lang: block.get(lang, empty) for lang in languages}
+        
+        if wide_writer is not None:
+            with METRICS.timer("align_seconds", pair="all"):
+                wide = build_canonical_table(frames, languages)
+            wide_writer.append(wide)
+            METRICS.inc("rows_written", len(wide), table="all")
+        for (lang1, lang2, _), writer in zip(tasks, writers):
+            pair_df = pair_table(frames, lang1, lang2, mode)
+            writer.append(pair_df)
+            METRICS.inc("rows_written", len(pair_df), table=f"{lang1}-{lang2}")
+    
+    if wide_writer is not None:
+        wide_writer.close()
+        print(f"Saved: {output_dir}/All_Languages_Parallel{suffix}")
+    for (_, _, out_filename), writer in zip(tasks, writers):
+        writer.close()
+        print(f"Saved: {out_filename}")
+
 # Helper function to debug the file structure and column names
 def debug_file_structure():
     pathlist = Path("Verses").glob('**/*.tsv')
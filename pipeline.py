@@ -0,0 +1,340 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+from playwright.async_api import async_playwright
+
+import metrics
+import scrape
+from data_cleaning import BOOK_MAPPING, process_chapter_file, process_chapter_page
+from http_fetch import make_client
+from manifest import Manifest
+from metrics import METRICS, Progress, collected
+from parallel_corpus import (
+    ALL_LANGUAGES,
+    CORPUS_MODE,
+    LANGUAGE_PAIRS,
+    VERSE_COLUMNS,
+    build_canonical_table,
+    open_corpus_writer,
+    pair_table,
+    pair_tasks,
+)
+from raw_store import RAW_STORE_DIR, RawStore
+
+# Scrape -> segment -> align run as overlapping stages. The queues between
+# them are bounded, so a slow stage makes the one before it wait instead
+# of letting pages pile up in memory.
+SEGMENT_QUEUE_SIZE = 32  # fetched pages waiting for a segmentation worker
+ALIGN_QUEUE_SIZE = 64  # segmented chapters waiting for the aligner
+SEGMENT_WORKERS = os.cpu_count() or 1
+
+OUTPUT_DIR = "Parallel_Corpus_Stream"
+OUTPUT_FORMAT = "tsv"
+
+DONE = None  # end-of-stream marker on a queue
+
+
+def parse_label(label):
+    """
+    "{book}.{chapter}.{bible_ver}.{lang}" -> (book, chapter, lang)
+    """
+    book, chapter, _, lang = label.split(".")
+    return book, chapter, lang
+
+
+def chapter_major(jobs, seen=None):
+    """
+    Reorder a batch so the languages of each chapter are fetched one after
+    another; batches list every chapter of one language first, which would
+    hold a whole book in the aligner before its first chapter completes.
+
+    Jobs whose URL is already in `seen` (listed twice in a batch, or in an
+    earlier batch sharing the set) are dropped; seen is updated.
+    """
+    if seen is None:
+        seen = set()
+    chapters = {}
+    for job in jobs:
+        if job["url"] in seen:
+            continue
+        seen.add(job["url"])
+        book, chapter, _ = parse_label(job["label"])
+        chapters.setdefault((book, chapter), []).append(job)
+    return [job for group in chapters.values() for job in group]
+
+
+class ChapterAssembler:
+    """
+    Holds segmented chapters until every language expected for them has
+    arrived (failed fetches count as arrived, with no verses). A chapter
+    is handed out once; pages for it arriving afterwards are ignored.
+    """
+
+    def __init__(self, expected):
+        self.expected = expected  # {(book, chapter): {lang}}
+        self.pending = {}
+        self.emitted = set()
+
+    def add(self, book, chapter, lang, verses):
+        """
+        Returns {lang: verse rows} once the chapter is complete, else None.
+        """
+        key = (book, chapter)
+        if key in self.emitted:
+            METRICS.inc("pages_duplicate")
+            return None
+        arrived = self.pending.setdefault(key, {})
+        arrived[lang] = verses
+        if set(arrived) >= self.expected.get(key, set()):
+            self.emitted.add(key)
+            return self.pending.pop(key)
+        return None
+
+    def drain(self):
+        """
+        Whatever is left at the end of a run, incomplete or not.
+        """
+        pending, self.pending = self.pending, {}
+        self.emitted.update(pending)
+        return pending.items()
+
+
+def chapter_tables(languages, pairs, mode, all_languages, book_acro, chapter, verses_by_lang):
+    """
+    Align one chapter: (all-languages table or None, one table per pair in
+    `pairs`), or None if no language has verses for it. Runs in the
+    segmentation pool, so chapters are aligned side by side.
+    """
+    book = BOOK_MAPPING.get(book_acro, book_acro)
+    frames = {}
+    for lang in languages:
+        rows = [[book, chapter, verse, text] for verse, text in verses_by_lang.get(lang) or []]
+        frames[lang] = pd.DataFrame(rows, columns=VERSE_COLUMNS, dtype=str)
+    if not any(len(df) for df in frames.values()):
+        return None
+
+    wide = None
+    if all_languages:
+        with METRICS.timer("align_seconds", pair="all"):
+            wide = build_canonical_table(frames, languages)
+    return wide, [pair_table(frames, lang1, lang2, mode) for lang1, lang2 in pairs]
+
+
+class ChapterWriter:
+    """
+    Appends each completed chapter's parallel rows to the stream outputs:
+    every language pair and, with all_languages, the all-languages table.
+    Rows are written in the order chapters complete, not in canonical
+    order. The pipeline writes no Verses/ tables to rebuild them from; for
+    a canonically ordered corpus, segment the pages it stored with
+    data_cleaning.py and run parallel_corpus.py.
+    """
+
+    def __init__(
+        self, languages, output_dir=OUTPUT_DIR, output_format=OUTPUT_FORMAT, mode=CORPUS_MODE, all_languages=ALL_LANGUAGES
+    ):
+        self.languages = languages
+        self.mode = mode
+        suffix = ".parquet" if output_format == "parquet" else ".tsv"
+        os.makedirs(output_dir, exist_ok=True)
+        self.wide_writer = None
+        if all_languages:
+            self.wide_writer = open_corpus_writer(
+                f"{output_dir}/All_Languages_Parallel{suffix}", ["Book", "Chapter", "Verse"] + languages
+            )
+        self.tasks = pair_tasks(LANGUAGE_PAIRS, languages, output_dir, suffix)
+        self.pair_writers = [
+            open_corpus_writer(out_filename, ["Book", "Chapter", "Verse", lang1, lang2])
+            for lang1, lang2, out_filename in self.tasks
+        ]
+        self.chapters = 0
+
+    def align_args(self):
+        """
+        The leading arguments of chapter_tables for this writer's outputs.
+        """
+        pairs = [(lang1, lang2) for lang1, lang2, _ in self.tasks]
+        return self.languages, pairs, self.mode, self.wide_writer is not None
+
+    def write(self, tables):
+        """
+        Append what chapter_tables returned; returns the rows written.
+        """
+        if tables is None:
+            return 0
+        wide, pair_dfs = tables
+        rows = 0
+        if wide is not None:
+            self.wide_writer.append(wide)
+            METRICS.inc("rows_written", len(wide), table="all")
+            rows += len(wide)
+        for (lang1, lang2, _), writer, pair_df in zip(self.tasks, self.pair_writers, pair_dfs):
+            writer.append(pair_df)
+            METRICS.inc("rows_written", len(pair_df), table=f"{lang1}-{lang2}")
+            rows += len(pair_df)
+        self.chapters += 1
+        return rows
+
+    def close(self):
+        if self.wide_writer is not None:
+            self.wide_writer.close()
+        for writer in self.pair_writers:
+            writer.close()
+
+
+async def run_stages(batches, scrape_batch, store_root=None, workers=SEGMENT_WORKERS, output_dir=OUTPUT_DIR):
+    """
+    Drive the three stages over `batches` ({batch: jobs}).
+
+    scrape_batch(y, jobs, on_chapter) fetches one batch and awaits
+    on_chapter(job, html, ok) per chapter, as scrape_batch_async does. Pages
+    go to a process pool for segmentation; once all of a chapter's
+    languages are in, it is aligned in the same pool (up to `workers`
+    chapters at once) and its parallel rows are written.
+    """
+    expected = {}
+    for jobs in batches.values():
+        for job in jobs:
+            book, chapter, lang = parse_label(job["label"])
+            expected.setdefault((book, chapter), set()).add(lang)
+    languages = sorted({lang for langs in expected.values() for lang in langs})
+
+    segment_queue = asyncio.Queue(SEGMENT_QUEUE_SIZE)
+    align_queue = asyncio.Queue(ALIGN_QUEUE_SIZE)
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    writer = ChapterWriter(languages, output_dir)
+    progress = Progress("Aligned chapters", total=len(expected))
+    running_segmenters = workers
+
+    async def on_chapter(job, html, ok):
+        await segment_queue.put((job, html, ok))
+
+    async def scrape_all():
+        for y, jobs in batches.items():
+            await scrape_batch(y, jobs, on_chapter)
+        for _ in range(workers):
+            await segment_queue.put(DONE)
+
+    async def segmenter():
+        nonlocal running_segmenters
+        while True:
+            item = await segment_queue.get()
+            if item is DONE:
+                break
+            job, html, ok = item
+            result = None
+            if ok and html is not None:
+                result, snapshot = await loop.run_in_executor(
+                    executor, collected, process_chapter_page, job["label"] + ".html", html
+                )
+                METRICS.merge(snapshot)
+            elif ok:
+                # Stored by an earlier run: read it back from the archive
+                source = (store_root, job["label"]) if store_root is not None else Path(job["save_path"])
+                result, snapshot = await loop.run_in_executor(executor, collected, process_chapter_file, source)
+                METRICS.merge(snapshot)
+            METRICS.inc("pages_segmented" if result is not None else "pages_skipped")
+            await align_queue.put((job, result))
+
+        running_segmenters -= 1
+        if running_segmenters == 0:
+            await align_queue.put(DONE)
+
+    # Chapters being aligned in the pool; the aligner waits for a free
+    # slot, which holds back the align queue in turn
+    align_slots = asyncio.Semaphore(workers)
+    write_lock = asyncio.Lock()
+
+    async def aligner():
+        assembler = ChapterAssembler(expected)
+        emitting = []
+
+        async def start_emit(book, chapter, verses_by_lang):
+            await align_slots.acquire()
+            emitting.append(asyncio.create_task(emit(book, chapter, verses_by_lang)))
+
+        while True:
+            item = await align_queue.get()
+            if item is DONE:
+                break
+            job, result = item
+            book, chapter, lang = parse_label(job["label"])
+            verses = result["verses"] if result is not None else None
+            complete = assembler.add(book, chapter, lang, verses)
+            if complete is not None:
+                await start_emit(book, chapter, complete)
+
+        for (book, chapter), verses_by_lang in assembler.drain():
+            await start_emit(book, chapter, verses_by_lang)
+        await asyncio.gather(*emitting)
+
+    async def emit(book, chapter, verses_by_lang):
+        try:
+            tables, snapshot = await loop.run_in_executor(
+                executor, collected, chapter_tables, *writer.align_args(), book, chapter, verses_by_lang
+            )
+        finally:
+            align_slots.release()
+        METRICS.merge(snapshot)
+        async with write_lock:
+            rows = await asyncio.to_thread(writer.write, tables)
+            if writer.chapters == 1 and rows:
+                print(f"First parallel rows ({book} {chapter}) after {time.perf_counter() - start:.1f}s")
+        if rows:
+            progress.update(detail=f"last {book} {chapter}")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        try:
+            await asyncio.gather(scrape_all(), aligner(), *(segmenter() for _ in range(workers)))
+        finally:
+            writer.close()
+
+    print(f"Pipeline wrote {writer.chapters} chapters in {time.perf_counter() - start:.1f}s")
+
+
+async def run_pipeline(batches=scrape.BATCH):
+    store = RawStore(RAW_STORE_DIR) if scrape.STORAGE == "archive" else None
+    store_root = Path(RAW_STORE_DIR).resolve() if store is not None else None
+    manifest = Manifest(store=store)
+    # A chapter listed twice (scrape-info/4 has JOL twice) is fetched and
+    # written once
+    seen = set()
+    jobs = {y: chapter_major(scrape.iter_chapters(scrape.load_batch(y)), seen) for y in batches}
+
+    async with async_playwright() as pw:
+        pool = await scrape.open_browser_pool(pw)
+        client = None
+        if scrape.FETCH_BACKEND == "http":
+            client = make_client(scrape.custom_ua, scrape.CONCURRENCY)
+
+        limiter = scrape.make_limiter()
+
+        async def scrape_batch(y, batch_jobs, on_chapter):
+            print(f"Processing batch {y}...")
+            errors, stats = await scrape.scrape_batch_async(
+                pool, y, manifest, client, jobs=batch_jobs, on_chapter=on_chapter, limiter=limiter
+            )
+            scrape.report_errors(errors)
+            summary = scrape.run_summary(stats, limiter)
+            print(summary)
+            scrape.send_notification(y, errors, summary)
+
+        try:
+            with metrics.stage("pipeline"):
+                await run_stages(jobs, scrape_batch, store_root)
+        finally:
+            if client is not None:
+                await client.aclose()
+            await scrape.close_browser_pool(pool)
+            manifest.close()
+            if store is not None:
+                store.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(run_pipeline())
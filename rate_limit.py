@@ -0,0 +1,242 @@
+import asyncio
+import collections
+import random
+import statistics
+import time
+import urllib.parse
+
+LATENCY_WINDOW = 20  # responses in the rolling latency window
+LATENCY_FACTOR = 2.0  # median latency above this x the best median seen is congestion
+DECREASE_FACTOR = 0.5  # in-flight limit and request rate multiplier on congestion
+RATE_STEP = 0.25  # requests/second added to the rate per additive increase
+DECREASE_COOLDOWN = 2.0  # seconds after a cut before congestion can cut again
+LOG_EVERY = 60  # seconds between routine controller state lines
+
+
+class TokenBucket:
+    """
+    Async token bucket: `rate` tokens are added per second up to `burst`.
+    Each acquire() takes one token, sleeping until one is available.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        # The lock keeps waiters in arrival order so one slow host can't be
+        # starved by a burst of newer requests.
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class HostRateLimiter:
+    """
+    One token bucket per host, created lazily the first time a host is seen.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+
+    def bucket_for(self, url):
+        host = urllib.parse.urlsplit(url).netloc
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(self.rate, self.burst)
+        return self.buckets[host]
+
+    async def acquire(self, url):
+        await self.bucket_for(url).acquire()
+
+    # The fixed limiter has no in-flight cap and learns nothing from
+    # responses; these keep it interchangeable with HostAdaptiveLimiter.
+    async def pace(self, url):
+        await self.acquire(url)
+
+    async def release(self, url, status=None, seconds=None):
+        pass
+
+    def format_summary(self):
+        return f"Fixed pacing: {self.rate:g} navigations/s per host"
+
+
+class AIMDController:
+    """
+    Additive-increase / multiplicative-decrease pacing for one host: how
+    many requests may be in flight and the minimum gap between request
+    starts, both kept within the given bounds.
+
+    Every `limit` healthy responses raise the limit by one and the request
+    rate (1 / delay) by RATE_STEP. Throttling (429), server errors,
+    timeouts, or a rolling median latency above LATENCY_FACTOR x the best
+    median seen, scale both down by DECREASE_FACTOR. Responses to requests
+    sent before the last cut, or within DECREASE_COOLDOWN of it, don't cut
+    again.
+    """
+
+    def __init__(self, limit, delay, min_limit=1, max_limit=8, min_delay=0.1, max_delay=30.0, name=""):
+        self.min_limit, self.max_limit = min_limit, max_limit
+        self.min_delay, self.max_delay = min_delay, max_delay
+        self.limit = max(min_limit, min(max_limit, limit))
+        self.delay = max(min_delay, min(max_delay, delay))
+        self.name = name
+        self.in_flight = 0
+        self.next_start = time.monotonic()
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self.best_median = None
+        self.successes = 0
+        self.last_decrease = float("-inf")
+        self.last_log = time.monotonic()
+        self.increases = 0
+        self.decreases = 0
+        self.congested = collections.Counter()  # reason -> responses
+        self._cond = asyncio.Condition()
+
+    async def acquire(self):
+        """
+        Wait for an in-flight slot, then for this request's start time. Every
+        acquire() must be matched by a release().
+        """
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+        await self.pace()
+
+    async def pace(self):
+        """
+        Space out a request start without taking a slot, for a second
+        navigation made while already holding one.
+        """
+        now = time.monotonic()
+        start = max(now, self.next_start)
+        self.next_start = start + self.delay
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    async def release(self, status=None, seconds=None):
+        """
+        Free the slot and learn from the response: its HTTP status (None for
+        a timeout or connection error) and how long it took. Pass no
+        seconds when the request says nothing about the server.
+        """
+        async with self._cond:
+            self.in_flight -= 1
+            if seconds is not None:
+                self._observe(status, seconds)
+            self._cond.notify_all()
+
+    def _observe(self, status, seconds):
+        now = time.monotonic()
+        reason = None
+        if status is None:
+            reason = "timeout"
+        elif status == 429:
+            reason = "throttled"
+        elif status >= 500:
+            reason = "server error"
+        else:
+            self.latencies.append(seconds)
+            if len(self.latencies) == self.latencies.maxlen:
+                median = statistics.median(self.latencies)
+                if self.best_median is None or median < self.best_median:
+                    self.best_median = median
+                if median > LATENCY_FACTOR * self.best_median:
+                    reason = "latency"
+
+        if reason is None:
+            self.successes += 1
+            if self.successes >= self.limit:
+                self._increase()
+        else:
+            self.congested[reason] += 1
+            if now - seconds >= self.last_decrease and now - self.last_decrease >= DECREASE_COOLDOWN:
+                self._decrease(now, reason)
+
+        if now - self.last_log >= LOG_EVERY:
+            self._log("steady")
+
+    def _increase(self):
+        self.successes = 0
+        if self.limit < self.max_limit or self.delay > self.min_delay:
+            self.limit = min(self.max_limit, self.limit + 1)
+            self.delay = max(self.min_delay, 1 / (1 / self.delay + RATE_STEP))
+            self.increases += 1
+
+    def _decrease(self, now, reason):
+        self.limit = max(self.min_limit, int(self.limit * DECREASE_FACTOR))
+        self.delay = min(self.max_delay, self.delay / DECREASE_FACTOR)
+        self.successes = 0
+        self.last_decrease = now
+        # The window still holds the slow responses that triggered the cut
+        self.latencies.clear()
+        self.decreases += 1
+        self._log(f"backing off ({reason})")
+
+    def format_state(self):
+        median = statistics.median(self.latencies) if self.latencies else None
+        median_text = f"{median:.2f}s" if median is not None else "n/a"
+        return (
+            f"{self.limit} in flight, {self.delay:.2f}s delay, "
+            f"median latency {median_text}, "
+            f"{self.increases} increases / {self.decreases} decreases"
+        )
+
+    def _log(self, event):
+        self.last_log = time.monotonic()
+        print(f"Pacing {self.name}: {event}: {self.format_state()}")
+
+
+class HostAdaptiveLimiter:
+    """
+    One AIMDController per host, created lazily like HostRateLimiter's
+    buckets; `settings` are passed to each controller.
+    """
+
+    def __init__(self, **settings):
+        self.settings = settings
+        self.controllers = {}
+
+    def controller_for(self, url):
+        host = urllib.parse.urlsplit(url).netloc
+        if host not in self.controllers:
+            self.controllers[host] = AIMDController(name=host, **self.settings)
+        return self.controllers[host]
+
+    async def acquire(self, url):
+        await self.controller_for(url).acquire()
+
+    async def pace(self, url):
+        await self.controller_for(url).pace()
+
+    async def release(self, url, status=None, seconds=None):
+        await self.controller_for(url).release(status, seconds)
+
+    def format_summary(self):
+        lines = []
+        for host, controller in self.controllers.items():
+            congested = ", ".join(f"{n} {reason}" for reason, n in controller.congested.items())
+            lines.append(f"Pacing {host}: {controller.format_state()}" + (f" ({congested})" if congested else ""))
+        return "\n".join(lines) or "Pacing: no requests made"
+
+
+def backoff_delay(attempt, base=2.0, cap=60.0):
+    """
+    Exponential backoff for the given (1-based) retry attempt. Half of the
+    delay is randomised so workers that failed together don't retry together.
+    """
+    delay = min(cap, base * 2 ** (attempt - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
@@ -0,0 +1,220 @@
+import hashlib
+import os
+import sqlite3
+import struct
+import zlib
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:  # zlib is always available and still shrinks HTML ~6x
+    zstandard = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process writers only
+    fcntl = None
+
+RAW_STORE_DIR = "Raw-Store"
+INDEX_NAME = "index.sqlite"
+SHARD_SUFFIX = ".shard"
+
+CODEC_ZLIB = 0
+CODEC_ZSTD = 1
+
+# Every record is self-describing so the index can be rebuilt from shards:
+# magic, codec, key length, payload length, then the key and the payload.
+RECORD_HEADER = struct.Struct("<4sBII")
+RECORD_MAGIC = b"RAW1"
+
+
+def _compress(data):
+    if zstandard is not None:
+        return CODEC_ZSTD, zstandard.ZstdCompressor(level=10).compress(data)
+    return CODEC_ZLIB, zlib.compress(data, 6)
+
+
+def _decompress(codec, payload):
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Record is zstd-compressed; install zstandard to read it")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    return zlib.decompress(payload)
+
+
+def shard_for(key):
+    """
+    Chapter keys look like "{book}.{chapter}.{bible_ver}.{lang}"; records are
+    sharded per language.
+    """
+    return key.rsplit(".", 1)[-1] + SHARD_SUFFIX
+
+
+def is_raw_store(path):
+    return (Path(path) / INDEX_NAME).exists()
+
+
+class RawStore:
+    """
+    Append-only, compressed archive of raw chapter pages.
+
+    Pages are stored as compressed records in one shard file per language
+    plus a SQLite index from chapter key to (shard, offset, length). Writing
+    a key again appends a new record and repoints the index at it.
+    """
+
+    def __init__(self, root=RAW_STORE_DIR):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.root / INDEX_NAME)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                key TEXT PRIMARY KEY,
+                shard TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                codec INTEGER NOT NULL,
+                raw_size INTEGER NOT NULL,
+                sha256 TEXT NOT NULL
+            )
+            """
+        )
+        self.conn.commit()
+        self._readers = {}
+
+    def put(self, key, html, commit=True):
+        data = html.encode("utf-8")
+        codec, payload = _compress(data)
+        key_bytes = key.encode("utf-8")
+        shard = shard_for(key)
+
+        with open(self.root / shard, "ab") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0, os.SEEK_END)
+                offset = f.tell() + RECORD_HEADER.size + len(key_bytes)
+                f.write(RECORD_HEADER.pack(RECORD_MAGIC, codec, len(key_bytes), len(payload)))
+                f.write(key_bytes)
+                f.write(payload)
+                f.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+        self.conn.execute(
+            "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, shard, offset, len(payload), codec, len(data), hashlib.sha256(data).hexdigest()),
+        )
+        if commit:
+            self.conn.commit()
+
+    def info(self, key):
+        return self.conn.execute("SELECT * FROM pages WHERE key = ?", (key,)).fetchone()
+
+    def __contains__(self, key):
+        return self.info(key) is not None
+
+    def _read(self, shard, offset, length, codec):
+        f = self._readers.get(shard)
+        if f is None:
+            f = self._readers[shard] = open(self.root / shard, "rb")
+        f.seek(offset)
+        return _decompress(codec, f.read(length)).decode("utf-8")
+
+    def get(self, key):
+        row = self.info(key)
+        if row is None:
+            return None
+        return self._read(row["shard"], row["offset"], row["length"], row["codec"])
+
+    def keys(self, lang=None):
+        """
+        Keys in on-disk order (shard, offset) so reading them back in this
+        order is a sequential scan of each shard.
+        """
+        if lang is None:
+            rows = self.conn.execute("SELECT key FROM pages ORDER BY shard, offset")
+        else:
+            rows = self.conn.execute(
+                "SELECT key FROM pages WHERE shard = ? ORDER BY offset",
+                (lang + SHARD_SUFFIX,),
+            )
+        return [row["key"] for row in rows]
+
+    def iter_records(self, lang=None):
+        """
+        Stream (key, html) for every stored page, one shard at a time.
+        """
+        query = "SELECT key, shard, offset, length, codec FROM pages"
+        params = ()
+        if lang is not None:
+            query += " WHERE shard = ?"
+            params = (lang + SHARD_SUFFIX,)
+        for row in self.conn.execute(query + " ORDER BY shard, offset", params).fetchall():
+            yield row["key"], self._read(row["shard"], row["offset"], row["length"], row["codec"])
+
+    def rebuild_index(self):
+        """
+        Recreate the index by scanning every shard; the last record written
+        for a key wins.
+        """
+        self.conn.execute("DELETE FROM pages")
+        for shard_path in sorted(self.root.glob("*" + SHARD_SUFFIX)):
+            with open(shard_path, "rb") as f:
+                while True:
+                    header = f.read(RECORD_HEADER.size)
+                    if len(header) < RECORD_HEADER.size:
+                        break
+                    magic, codec, key_len, length = RECORD_HEADER.unpack(header)
+                    if magic != RECORD_MAGIC:
+                        raise ValueError(f"Corrupt record in {shard_path} at {f.tell() - len(header)}")
+                    key = f.read(key_len).decode("utf-8")
+                    offset = f.tell()
+                    data = _decompress(codec, f.read(length))
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (key, shard_path.name, offset, length, codec, len(data), hashlib.sha256(data).hexdigest()),
+                    )
+        self.conn.commit()
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        for f in self._readers.values():
+            f.close()
+        self._readers.clear()
+        self.conn.close()
+
+
+def import_html_tree(input_folder, store):
+    """
+    One-shot import of an existing Original-Text tree into the store.
+    """
+    files = sorted(Path(input_folder).rglob("*.html"))
+    print(f"Importing {len(files)} HTML files from {input_folder} into {store.root}")
+
+    raw_bytes = 0
+    for n, path in enumerate(files, start=1):
+        with path.open("r", encoding="utf-8") as f:
+            html = f.read()
+        raw_bytes += len(html.encode("utf-8"))
+        store.put(path.stem, html, commit=False)
+        if n % 1000 == 0:
+            store.commit()
+            print(f"Imported {n}/{len(files)}")
+    store.commit()
+
+    stored_bytes = sum(p.stat().st_size for p in store.root.glob("*" + SHARD_SUFFIX))
+    print(f"Imported {len(files)} pages: {raw_bytes} bytes -> {stored_bytes} bytes in shards")
+
+
+if __name__ == "__main__":
+    store = RawStore(RAW_STORE_DIR)
+    import_html_tree("Original-Text", store)
+    store.close()
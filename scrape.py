@@ -1,110 +1,665 @@
 from playwright.sync_api import sync_playwright
-import json, os, urllib.parse, time
+from playwright.async_api import async_playwright
+import argparse, asyncio, json, math, os, socket, urllib.parse, time
 import smtplib
 from email.message import EmailMessage
 from dotenv import load_dotenv
 
+import metrics
+from browser_pool import BrowserCrashed, BrowserPool
+from http_fetch import fetch_chapter, make_client
+from manifest import MIN_HTML_LENGTH, Manifest
+from metrics import BYTES_BUCKETS, METRICS, Progress
+from rate_limit import HostAdaptiveLimiter, HostRateLimiter, backoff_delay
+from raw_store import RAW_STORE_DIR, RawStore
+from work_queue import WorkQueue
+
 # Load environment variables from .env in project root
 load_dotenv()
 
 DELAY = 1  # seconds
 BATCH = range(3, 10)
 
+# "async" fetches with a pool of pages, "sync" is the original one-page loop,
+# "queue" leases chapters from the shared work queue (work_queue.py) so any
+# number of processes, here or on hosts sharing the queue file over a
+# network filesystem with working locks, can scrape BATCH together. Only
+# the queue is shared: pages land in each host's own manifest and Raw-Store
+MODE = "async"
+CONCURRENCY = 4  # pages (each in its own context) navigating at once
+# "adaptive" paces async fetches with an AIMD controller per host that
+# widens or narrows the in-flight limit and the delay between requests from
+# status codes and latency (rate_limit.AIMDController); "fixed" is a token
+# bucket at RATE_PER_HOST
+PACING = "adaptive"
+INITIAL_IN_FLIGHT = 2  # adaptive: starting in-flight limit, at most CONCURRENCY
+MIN_IN_FLIGHT = 1
+MIN_DELAY = 0.2  # adaptive: bounds on the gap between request starts, seconds
+MAX_DELAY = 30.0
+RATE_PER_HOST = 1 / DELAY  # fixed: navigations per second allowed per host
+BURST = 2  # fixed: navigations a host may receive back to back before throttling
+# "http" fetches pages with a pooled HTTP client and only falls back to the
+# browser for chapters that need JS; "browser" always uses Playwright
+FETCH_BACKEND = "http"
+BASE_URL = "https://www.bible.com"
+# "lean" blocks heavy resources, waits only for the chapter text and keeps
+# just the chapter container; "full" waits for "load" and saves the document
+PAGE_PROFILE = "lean"
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font", "stylesheet"}
+BLOCKED_URL_PARTS = (
+    "google-analytics",
+    "googletagmanager",
+    "doubleclick",
+    "googlesyndication",
+    "facebook",
+    "hotjar",
+    "sentry",
+)
+CHAPTER_SELECTOR = "span.ChapterContent_content__RrUqA"
+CHAPTER_TIMEOUT = 15_000  # ms to wait for the chapter text to appear
+# "archive" writes pages into the compressed RawStore shards, "files" keeps
+# one loose Original-Text/{book}/{lang}/*.html file per chapter
+STORAGE = "archive"
+MAX_ATTEMPTS = 4  # fetch attempts per chapter before it is recorded as failed
+MAX_CRASH_REQUEUES = 3  # times a chapter goes back in the queue after a browser crash
+LEASE_SIZE = 16  # chapters a queue worker leases at a time
+QUEUE_POLL = 30  # seconds to wait while other workers hold every remaining lease
+
 
 custom_ua = (
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:142.0) Gecko/20100101 Firefox/142.0"
 )
 
-with sync_playwright() as pw:
-    browser = pw.chromium.launch(headless=True)
-    context = browser.new_context(user_agent=custom_ua)
-    page = context.new_page()
-
-    print("Starting scraping...")
-
-    for y in BATCH:
-        errors = []
-        saved_count = 0
-        print(f"Processing batch {y}...")
-        # Segment to batches scraping in order to avoid rerunning if
-        # one batch fails or is interrupted.
-        with open(f"scrape-info/{y}/data.json", "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-            for i in data:
-                save_dir = f"Original-Text/{i['book']}/{i['lang']}"
-                os.makedirs(save_dir, exist_ok=True)
-                for ch in range(1, i["chapter_length"] + 1):
-                    url = f"https://www.bible.com/bible/{i['ver']}/{i['book']}.{ch}.{i['bible_ver']}"
-
-                    filename = f"{i['book']}.{ch}.{i['bible_ver']}.{i['lang']}.html"
-                    save_path = os.path.join(save_dir, filename)
-
-                    resp = page.goto(url, wait_until="load")
-
-                    if resp.status != 200:
-                        errors.append(f"Failed to load {url}: HTTP {resp.status}")
-                        continue
-
-                    html = page.content()
-
-                    if not html or len(html) < 100:  # Arbitrary minimum length
-                        errors.append(f"Invalid/empty content for {url}")
-                        continue
-
-                    try:
-                        with open(save_path, "w", encoding="utf-8") as f:
-                            f.write(html)
-                        saved_count += 1
-
-                    except Exception as e:
-                        errors.append(
-                            f"Error saving HTML {i['book']}.{ch}.{i['bible_ver']}.{i['lang']}: {e}"
-                        )
-                    # Clear line and print progress
-                    progress_msg = f"({i['book']}.{ch}.{i['bible_ver']}.{i['lang']}) Saved: {saved_count} | Errors: {len(errors)}"
-                    print(f"\r{progress_msg:<80}", end="", flush=True)
-
-                    time.sleep(DELAY)
-        if errors:
-            print("\nErrors encountered:")
-            for error in errors:
-                print(error)
+
+class ScrapeStats:
+    """
+    Per-run throughput counters: chapters saved per second and navigation
+    latency (mean / p95) over every page.goto in the run.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.latencies = []
+        self.saved = 0
+        self.skipped = 0
+        self.http_fetches = 0
+        self.browser_fetches = 0
+        self.bytes_saved = []  # per lean browser fetch: UTF-8 bytes of document - kept HTML
+
+    def record_navigation(self, seconds, status=None):
+        self.latencies.append(seconds)
+        METRICS.observe("navigation_seconds", seconds)
+        METRICS.inc("responses", status=str(status))
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        latencies = sorted(self.latencies)
+        if latencies:
+            mean = sum(latencies) / len(latencies)
+            p95 = latencies[max(math.ceil(0.95 * len(latencies)) - 1, 0)]
         else:
-            print("\nScrape completed with no errors.")
+            mean = p95 = 0.0
+        return {
+            "chapters": self.saved,
+            "skipped": self.skipped,
+            "http_fetches": self.http_fetches,
+            "browser_fetches": self.browser_fetches,
+            "bytes_saved": sum(self.bytes_saved),
+            "mean_bytes_saved": (
+                round(sum(self.bytes_saved) / len(self.bytes_saved))
+                if self.bytes_saved
+                else 0
+            ),
+            "elapsed": round(elapsed, 2),
+            "chapters_per_sec": round(self.saved / elapsed, 3) if elapsed else 0.0,
+            "mean_latency": round(mean, 3),
+            "p95_latency": round(p95, 3),
+        }
 
-        # --- email notification (minimal, configured via environment variables) ---
-        try:
-            # Default to Gmail's SMTP if not specified in .env
-            smtp_server = os.environ.get("SMTP_SERVER", "smtp.gmail.com")
-            smtp_port = int(os.environ.get("SMTP_PORT", "587"))
-            smtp_user = os.environ.get("SMTP_USER")
-            smtp_pass = os.environ.get("SMTP_PASS")
-            # If SCRAPE_NOTIFY_TO isn't set, fall back to the SMTP_USER (send to self)
-            notify_to = os.environ.get("SCRAPE_NOTIFY_TO") or smtp_user
-
-            if smtp_server and smtp_user and smtp_pass and notify_to:
-                msg = EmailMessage()
-                msg["From"] = smtp_user
-                msg["To"] = notify_to
-                msg["Subject"] = f"Scrape finished: NLP1K - Batch {y}"
-                body = "Scraping finished.\n\n"
-                if errors:
-                    body += "Errors:\n" + "\n".join(errors)
-                else:
-                    body += "No errors encountered."
-                msg.set_content(body)
-
-                with smtplib.SMTP(smtp_server, smtp_port, timeout=10) as s:
-                    s.starttls()
-                    s.login(smtp_user, smtp_pass)
-                    s.send_message(msg)
-                print("Notification email sent to", notify_to)
+    def format_summary(self):
+        s = self.summary()
+        return (
+            f"{s['chapters']} chapters in {s['elapsed']}s "
+            f"({s['chapters_per_sec']} chapters/sec), "
+            f"{s['skipped']} already valid | "
+            f"navigation mean {s['mean_latency']}s, p95 {s['p95_latency']}s | "
+            f"{s['http_fetches']} HTTP / {s['browser_fetches']} browser fetches | "
+            f"lean capture saved {s['bytes_saved']} bytes "
+            f"({s['mean_bytes_saved']} per chapter)"
+        )
+
+
+def load_batch(y):
+    with open(f"scrape-info/{y}/data.json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def iter_chapters(data):
+    """
+    Flatten batch entries into one job per chapter.
+    """
+    for i in data:
+        save_dir = f"Original-Text/{i['book']}/{i['lang']}"
+        for ch in range(1, i["chapter_length"] + 1):
+            label = f"{i['book']}.{ch}.{i['bible_ver']}.{i['lang']}"
+            yield {
+                "url": f"{BASE_URL}/bible/{i['ver']}/{i['book']}.{ch}.{i['bible_ver']}",
+                "save_dir": save_dir,
+                "save_path": os.path.join(save_dir, f"{label}.html"),
+                "label": label,
+            }
+
+
+def check_chapter(job, status, html):
+    """
+    Return an error message if a fetched chapter is unusable, else None.
+    """
+    if status != 200:
+        return f"Failed to load {job['url']}: HTTP {status}"
+    if not html or len(html) < MIN_HTML_LENGTH:
+        return f"Invalid/empty content for {job['url']}"
+    return None
+
+
+def is_retryable(status):
+    # Missing chapters (404 etc.) won't appear on a retry; throttling,
+    # server errors, timeouts (no status) and truncated pages might.
+    return status is None or status == 200 or status == 429 or status >= 500
+
+
+def save_chapter(job, status, html, errors, manifest):
+    """
+    Write a fetched chapter to the archive (or disk) and record it. Returns
+    True if saved.
+    """
+    try:
+        if manifest.store is not None:
+            manifest.store.put(job["label"], html)
+        else:
+            os.makedirs(job["save_dir"], exist_ok=True)
+            with open(job["save_path"], "w", encoding="utf-8") as f:
+                f.write(html)
+    except Exception as e:
+        error = f"Error saving HTML {job['label']}: {e}"
+        errors.append(error)
+        manifest.record_failure(job, status, error)
+        METRICS.inc("chapters_failed", reason="save")
+        return False
+    manifest.record_success(job, status, html)
+    METRICS.inc("chapters_saved")
+    METRICS.inc("bytes_fetched", len(html))
+    METRICS.observe("page_bytes", len(html), buckets=BYTES_BUCKETS)
+    return True
+
+
+def run_summary(stats, limiter=None):
+    """
+    The batch's throughput line, pacing state and every metric recorded so
+    far in this run, for the log and the notification email.
+    """
+    lines = [stats.format_summary()]
+    if limiter is not None:
+        lines.append(limiter.format_summary())
+    return "\n".join(lines + ["", "Run metrics so far:"] + METRICS.summary_lines())
+
+
+def report_errors(errors):
+    if errors:
+        print("\nErrors encountered:")
+        for error in errors:
+            print(error)
+    else:
+        print("\nScrape completed with no errors.")
+
+
+def send_notification(y, errors, summary=None):
+    # --- email notification (minimal, configured via environment variables) ---
+    try:
+        # Default to Gmail's SMTP if not specified in .env
+        smtp_server = os.environ.get("SMTP_SERVER", "smtp.gmail.com")
+        smtp_port = int(os.environ.get("SMTP_PORT", "587"))
+        smtp_user = os.environ.get("SMTP_USER")
+        smtp_pass = os.environ.get("SMTP_PASS")
+        # If SCRAPE_NOTIFY_TO isn't set, fall back to the SMTP_USER (send to self)
+        notify_to = os.environ.get("SCRAPE_NOTIFY_TO") or smtp_user
+
+        if smtp_server and smtp_user and smtp_pass and notify_to:
+            msg = EmailMessage()
+            msg["From"] = smtp_user
+            msg["To"] = notify_to
+            msg["Subject"] = f"Scrape finished: NLP1K - Batch {y}"
+            body = "Scraping finished.\n\n"
+            if summary:
+                body += summary + "\n\n"
+            if errors:
+                body += "Errors:\n" + "\n".join(errors)
             else:
-                print("SMTP environment not fully configured; skipping email.")
+                body += "No errors encountered."
+            msg.set_content(body)
+
+            with smtplib.SMTP(smtp_server, smtp_port, timeout=10) as s:
+                s.starttls()
+                s.login(smtp_user, smtp_pass)
+                s.send_message(msg)
+            print("Notification email sent to", notify_to)
+        else:
+            print("SMTP environment not fully configured; skipping email.")
+    except Exception as e:
+        print("Failed to send notification email:", e)
+
+
+def fetch_sync(page, job, stats):
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        start = time.perf_counter()
+        try:
+            resp = page.goto(job["url"], wait_until="load")
+            status = resp.status if resp else None
+            html = page.content() if status == 200 else None
+            error = check_chapter(job, status, html)
         except Exception as e:
-            print("Failed to send notification email:", e)
+            status, html, error = None, None, f"Failed to load {job['url']}: {e}"
+        stats.record_navigation(time.perf_counter() - start, status)
+
+        if error is None or not is_retryable(status) or attempt == MAX_ATTEMPTS:
+            return status, html, error
+        time.sleep(DELAY + backoff_delay(attempt))
+
+
+def scrape_batch_sync(page, y, manifest):
+    errors = []
+    stats = ScrapeStats()
+    progress = Progress(f"Batch {y} saved")
+
+    for job in iter_chapters(load_batch(y)):
+        if manifest.is_valid(job):
+            stats.skipped += 1
+            continue
+
+        status, html, error = fetch_sync(page, job, stats)
+        if error:
+            errors.append(error)
+            manifest.record_failure(job, status, error)
+            METRICS.inc("chapters_failed", reason="fetch")
+        elif save_chapter(job, status, html, errors, manifest):
+            stats.saved += 1
+            progress.update(detail=f"last {job['label']}, {len(errors)} errors")
+
+        time.sleep(DELAY)
+
+    return errors, stats
+
+
+# Outer HTML of the element holding every verse, plus the UTF-8 size of the
+# whole document so the saving can be reported without serialising it in
+# Python. Without the chapter container there is no telling how much of the
+# chapter an ancestor of the first verse holds, so nothing is captured and
+# the fetch fails (and is retried) instead of saving a fragment.
+CAPTURE_CHAPTER_JS = """
+(selector) => {
+    const content = document.querySelector(selector);
+    const chapter = content.closest('[class*="ChapterContent_chapter__"]');
+    if (!chapter) {
+        return [null, 0];
+    }
+    const size = new TextEncoder().encode(document.documentElement.outerHTML).length;
+    return [chapter.outerHTML, size];
+}
+"""
+
+
+async def block_heavy_resources(route):
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or any(
+        part in request.url for part in BLOCKED_URL_PARTS
+    ):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+async def new_browser_page(browser):
+    context = await browser.new_context(user_agent=custom_ua)
+    if PAGE_PROFILE == "lean":
+        await context.route("**/*", block_heavy_resources)
+    return context, await context.new_page()
+
+
+async def open_browser_pool(pw, size=CONCURRENCY):
+    """
+    Launch Chromium behind a BrowserPool that can relaunch it after a crash.
+    """
+
+    async def launch():
+        return await pw.chromium.launch(headless=True)
+
+    return BrowserPool(await launch(), new_browser_page, size, launch=launch)
+
+
+async def close_browser_pool(pool):
+    await pool.close()
+    await pool.browser.close()
+    print(pool.format_summary())
+
+
+async def browser_fetch(page, url, stats):
+    if PAGE_PROFILE != "lean":
+        resp = await page.goto(url, wait_until="load")
+        status = resp.status if resp else None
+        html = await page.content() if status == 200 else None
+        return status, html
+
+    # The chapter is captured as soon as it exists, but not before the
+    # document is fully parsed: the first verse span is attached while the
+    # rest of the chapter may still be streaming in. Heavy resources are
+    # blocked, so domcontentloaded comes little later than commit.
+    resp = await page.goto(url, wait_until="domcontentloaded")
+    status = resp.status if resp else None
+    if status != 200:
+        return status, None
+    await page.wait_for_selector(CHAPTER_SELECTOR, state="attached", timeout=CHAPTER_TIMEOUT)
+    html, document_bytes = await page.evaluate(CAPTURE_CHAPTER_JS, CHAPTER_SELECTOR)
+    if html is None:
+        # check_chapter fails the fetch as empty content
+        return status, None
+    stats.bytes_saved.append(document_bytes - len(html.encode("utf-8")))
+    return status, html
+
+
+def make_limiter(concurrency=CONCURRENCY):
+    if PACING == "fixed":
+        return HostRateLimiter(RATE_PER_HOST, BURST)
+    return HostAdaptiveLimiter(
+        limit=min(INITIAL_IN_FLIGHT, concurrency),
+        delay=DELAY,
+        min_limit=MIN_IN_FLIGHT,
+        max_limit=concurrency,
+        min_delay=MIN_DELAY,
+        max_delay=MAX_DELAY,
+    )
+
+
+async def fetch_async(fetch_once, job, limiter, stats):
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        await limiter.acquire(job["url"])
+        start = time.perf_counter()
+        try:
+            status, html = await fetch_once(job)
+            error = check_chapter(job, status, html)
+        except BrowserCrashed:
+            # Says nothing about the server: free the slot, the worker
+            # requeues the chapter
+            await limiter.release(job["url"])
+            raise
+        except Exception as e:
+            status, html, error = None, None, f"Failed to load {job['url']}: {e}"
+        seconds = time.perf_counter() - start
+        stats.record_navigation(seconds, status)
+        await limiter.release(job["url"], status, seconds)
+
+        if error is None or not is_retryable(status) or attempt == MAX_ATTEMPTS:
+            return status, html, error
+        await asyncio.sleep(backoff_delay(attempt))
+
+
+async def scrape_batch_async(
+    browser, y, manifest, client=None, concurrency=CONCURRENCY, jobs=None, on_chapter=None, limiter=None
+):
+    """
+    Fetch every chapter of a batch with up to `concurrency` workers at once.
+    Pacing comes from `limiter` (make_limiter() if not given; pass one in to
+    keep what it has learned across batches), so workers wait only as long
+    as the politeness budget requires.
+
+    With an HTTP `client`, workers read the server-rendered page directly
+    and only open a browser page for chapters that need JS to render.
+
+    `browser` is a BrowserPool, or a plain browser to pool for this batch
+    only. A chapter whose page crashes is put back in the queue.
+
+    `jobs` replaces the batch's own chapter order. `on_chapter(job, html,
+    ok)` is awaited as each chapter is settled: html is the saved page, or
+    None if it was already stored; ok is False when the chapter failed.
+    """
+    errors = []
+    stats = ScrapeStats()
+    if limiter is None:
+        limiter = make_limiter(concurrency)
+
+    if jobs is None:
+        jobs = iter_chapters(load_batch(y))
+
+    pool = browser if isinstance(browser, BrowserPool) else BrowserPool(browser, new_browser_page, concurrency)
+    crashes = {}
+
+    queue = asyncio.Queue()
+    for job in jobs:
+        if manifest.is_valid(job):
+            stats.skipped += 1
+            if on_chapter is not None:
+                await on_chapter(job, None, True)
+        else:
+            queue.put_nowait(job)
+    progress = Progress(f"Batch {y} saved" if y is not None else "Saved", total=queue.qsize())
+
+    async def fetch_once(job):
+        if client is not None:
+            stats.http_fetches += 1
+            status, html = await fetch_chapter(client, job["url"])
+            if status != 200 or html is not None:
+                return status, html
+            # Chapter isn't in the served page; render it in the browser
+            await limiter.pace(job["url"])
+
+        stats.browser_fetches += 1
+        async with pool.page() as page:
+            return await browser_fetch(page, job["url"], stats)
+
+    async def worker():
+        while True:
+            try:
+                job = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+
+            try:
+                status, html, error = await fetch_async(fetch_once, job, limiter, stats)
+            except BrowserCrashed as e:
+                crashes[job["url"]] = crashes.get(job["url"], 0) + 1
+                if crashes[job["url"]] <= MAX_CRASH_REQUEUES:
+                    print(f"Page crashed on {job['label']} ({e}); requeued")
+                    METRICS.inc("page_crashes")
+                    queue.put_nowait(job)
+                    continue
+                status, html = None, None
+                error = f"Failed to load {job['url']}: page crashed {crashes[job['url']]} times"
+
+            saved = False
+            if error:
+                errors.append(error)
+                manifest.record_failure(job, status, error)
+                METRICS.inc("chapters_failed", reason="fetch")
+            elif save_chapter(job, status, html, errors, manifest):
+                saved = True
+                stats.saved += 1
+            progress.update(detail=f"last {job['label']}, {len(errors)} errors")
+            if on_chapter is not None:
+                await on_chapter(job, html if saved else None, saved)
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        if pool is not browser:
+            await pool.close()
+    return errors, stats
+
+
+def run_sync():
+    store = RawStore(RAW_STORE_DIR) if STORAGE == "archive" else None
+    manifest = Manifest(store=store)
+    with sync_playwright() as pw:
+        browser = pw.chromium.launch(headless=True)
+        context = browser.new_context(user_agent=custom_ua)
+        page = context.new_page()
+
+        print("Starting scraping...")
+
+        for y in BATCH:
+            print(f"Processing batch {y}...")
+            # Segment to batches scraping in order to avoid rerunning if
+            # one batch fails or is interrupted.
+            with metrics.stage("scrape"):
+                errors, stats = scrape_batch_sync(page, y, manifest)
+            report_errors(errors)
+            summary = run_summary(stats)
+            print(summary)
+            send_notification(y, errors, summary)
+
+        browser.close()
+        manifest.close()
+        if store is not None:
+            store.close()
+        # After browser closes, print a final newline so following prints start on a fresh line
+        print()
+
+
+async def run_async():
+    store = RawStore(RAW_STORE_DIR) if STORAGE == "archive" else None
+    manifest = Manifest(store=store)
+    async with async_playwright() as pw:
+        pool = await open_browser_pool(pw)
+        client = make_client(custom_ua, CONCURRENCY) if FETCH_BACKEND == "http" else None
+
+        print(f"Starting scraping with {CONCURRENCY} concurrent workers...")
+
+        limiter = make_limiter()
+        for y in BATCH:
+            print(f"Processing batch {y}...")
+            with metrics.stage("scrape"):
+                errors, stats = await scrape_batch_async(pool, y, manifest, client, limiter=limiter)
+            report_errors(errors)
+            summary = run_summary(stats, limiter)
+            print(summary)
+            send_notification(y, errors, summary)
+
+        if client is not None:
+            await client.aclose()
+        await close_browser_pool(pool)
+        manifest.close()
+        if store is not None:
+            store.close()
+        print()
+
+
+def enqueue_batches(work_queue, batches=BATCH):
+    """
+    Flatten every batch into chapter jobs on the work queue; jobs already
+    queued (by this or another worker) are left alone, except failed ones,
+    which are queued again.
+    """
+    added = 0
+    for y in batches:
+        added += work_queue.enqueue(iter_chapters(load_batch(y)), batch=y)
+    return added
+
+
+async def renew_leases(work_queue, held, worker_id):
+    """
+    Keep the leases on `held` ({url: job}) alive while a block is being
+    fetched, so retries with backoff don't let them lapse to another worker.
+    """
+    while True:
+        await asyncio.sleep(work_queue.lease_seconds / 3)
+        for job in list(held.values()):
+            work_queue.renew(job, worker_id)
+
+
+async def scrape_queue_async(browser, work_queue, manifest, worker_id, client=None):
+    """
+    Lease chapters from the work queue and fetch them until no work is
+    left anywhere. Each chapter is settled on its own, so a crash loses at
+    most the leases this worker held, and those are handed out again once
+    they expire.
+    """
+    all_errors = []
+    held = {}
+    limiter = make_limiter()
+
+    async def settle(job, html, ok):
+        held.pop(job["url"], None)
+        if ok:
+            work_queue.complete(job)
+        else:
+            row = manifest.get(job["url"])
+            if row is None:
+                work_queue.fail(job, None, retry=True)
+            else:
+                work_queue.fail(job, row["error"], retry=is_retryable(row["http_status"]))
+
+    while True:
+        jobs = work_queue.lease(worker_id, LEASE_SIZE)
+        if not jobs:
+            if work_queue.outstanding() == 0:
+                break
+            # Other workers hold the remaining leases; one may yet expire
+            await asyncio.sleep(QUEUE_POLL)
+            continue
+
+        held = {job["url"]: job for job in jobs}
+        renewer = asyncio.create_task(renew_leases(work_queue, held, worker_id))
+        try:
+            errors, stats = await scrape_batch_async(
+                browser, None, manifest, client, jobs=jobs, on_chapter=settle, limiter=limiter
+            )
+        finally:
+            renewer.cancel()
+        all_errors.extend(errors)
+        print(stats.format_summary())
+
+    print(limiter.format_summary())
+    return all_errors
+
+
+async def run_queue(worker_id):
+    store = RawStore(RAW_STORE_DIR) if STORAGE == "archive" else None
+    manifest = Manifest(store=store)
+    work_queue = WorkQueue()
+    added = enqueue_batches(work_queue)
+    print(f"Worker {worker_id}: queued {added} new or failed chapters, {work_queue.outstanding()} outstanding")
+
+    async with async_playwright() as pw:
+        pool = await open_browser_pool(pw)
+        client = make_client(custom_ua, CONCURRENCY) if FETCH_BACKEND == "http" else None
+
+        with metrics.stage("scrape"):
+            errors = await scrape_queue_async(pool, work_queue, manifest, worker_id, client)
+        report_errors(errors)
+        summary = "\n".join([f"Work queue: {work_queue.counts()}", "", "Run metrics:"] + METRICS.summary_lines())
+        print(summary)
+        send_notification(f"queue ({worker_id})", errors, summary)
+
+        if client is not None:
+            await client.aclose()
+        await close_browser_pool(pool)
+        work_queue.close()
+        manifest.close()
+        if store is not None:
+            store.close()
+        print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape bible.com chapters")
+    parser.add_argument("--mode", choices=["async", "sync", "queue"], default=MODE)
+    parser.add_argument(
+        "--worker-id",
+        default=f"{socket.gethostname()}-{os.getpid()}",
+        help="name for this worker's leases in queue mode",
+    )
+    args = parser.parse_args()
 
-    browser.close()
-    # After browser closes, print a final newline so following prints start on a fresh line
-    print()
+    if args.mode == "queue":
+        asyncio.run(run_queue(args.worker_id))
+    elif args.mode == "async":
+        asyncio.run(run_async())
+    else:
+        run_sync()
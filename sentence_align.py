@@ -0,0 +1,294 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from columnar import PARQUET_SUFFIX, read_parquet
+from metrics import METRICS
+from parallel_corpus import LANGUAGE_PAIRS, find_language_files
+from verse_keys import BOOK_IDS
+
+SENTENCE_COLUMNS = ["Book", "Chapter", "Sentence", "Text"]
+NO_SENTENCE = "<no sentence>"
+
+# Gale & Church (1993): how many sentences each bead takes from either
+# side, the bead's prior probability, and the variance of the length ratio
+BEADS = [
+    (1, 1, 0.89),
+    (1, 0, 0.0099 / 2),
+    (0, 1, 0.0099 / 2),
+    (2, 1, 0.089 / 2),
+    (1, 2, 0.089 / 2),
+    (2, 2, 0.011),
+]
+BEAD_PENALTIES = [-np.log(prior) for _, _, prior in BEADS]
+VARIANCE = 6.8
+
+# The DP only fills cells within BAND x the longer side (at least
+# MIN_BAND sentences) of the chapter's diagonal; a chapter whose end falls
+# outside the band is aligned again without one
+BAND = 0.1
+MIN_BAND = 4
+# Chapters of similar size are aligned together, up to this many DP cells
+# (chapters x source x target sentences) per batch
+BATCH_CELLS = 2_000_000
+
+# Coefficients of Abramowitz & Stegun 7.1.26: erfc(x) ~ poly(t) * exp(-x^2)
+ERFC_P = 0.3275911
+ERFC_A = (0.254829592, -0.284496736, 1.421413741, -1.453152027, 1.061405429)
+
+
+def length_cost(l1, l2, ratio):
+    """
+    -log P(length difference) for beads of l1 source and l2 target
+    characters, where a source character is expected to become `ratio`
+    target characters. Works on arrays.
+    """
+    mean = np.maximum((l1 + l2 / ratio) / 2, 1e-9)
+    x = np.abs(ratio * l1 - l2) / np.sqrt(VARIANCE * mean) / np.sqrt(2)
+    t = 1 / (1 + ERFC_P * x)
+    poly = t * (ERFC_A[0] + t * (ERFC_A[1] + t * (ERFC_A[2] + t * (ERFC_A[3] + t * ERFC_A[4]))))
+    # log of the two-tailed probability, computed in log space so long
+    # mismatches don't underflow to log(0)
+    return x * x - np.log(poly)
+
+
+def prefix_lengths(lengths, size):
+    """
+    (chapters, size + 1) cumulative character counts, each row padded
+    with its total.
+    """
+    out = np.zeros((len(lengths), size + 1))
+    for c, row in enumerate(lengths):
+        out[c, 1 : len(row) + 1] = np.cumsum(row)
+        out[c, len(row) + 1 :] = out[c, len(row)]
+    return out
+
+
+def align_batch(chapters, band=BAND, min_band=MIN_BAND):
+    """
+    Gale-Church alignment of a batch of chapters given as (source sentence
+    lengths, target sentence lengths), every side non-empty.
+
+    The DP runs one anti-diagonal (cells with i + j = k) at a time: every
+    bead reaches a cell from earlier diagonals only, so each diagonal is a
+    few vectorized operations over all chapters of the batch and the
+    band's cells at once. Returns each chapter's beads as
+    (i0, i1, j0, j1) sentence slices.
+    """
+    count = len(chapters)
+    n = np.array([len(src) for src, _ in chapters])
+    m = np.array([len(tgt) for _, tgt in chapters])
+    rows, cols = n.max(), m.max()
+    src_len = prefix_lengths([src for src, _ in chapters], rows)
+    tgt_len = prefix_lengths([tgt for _, tgt in chapters], cols)
+    ratio = np.maximum(tgt_len[:, -1], 1) / np.maximum(src_len[:, -1], 1)
+
+    width = np.maximum(min_band, np.ceil(band * np.maximum(n, m)))
+    slope = m / n  # the chapter's diagonal: j = i * slope
+    share = n / (n + m)  # where that diagonal crosses i + j = k: i = k * share
+
+    cost = np.full((count, rows + 1, cols + 1), np.inf)
+    cost[:, 0, 0] = 0
+    back = np.full((count, rows + 1, cols + 1), -1, dtype=np.int8)
+    batch = np.arange(count)[:, None]
+
+    for k in range(1, rows + cols + 1):
+        lo = max(0, k - cols, int(np.floor(((k - width) * share).min())))
+        hi = min(k, rows, int(np.ceil(((k + width) * share).max())))
+        if lo > hi:
+            continue
+        i = np.arange(lo, hi + 1)
+        j = k - i
+
+        best = np.full((count, len(i)), np.inf)
+        move = np.full((count, len(i)), -1, dtype=np.int8)
+        for b, ((di, dj, _), penalty) in enumerate(zip(BEADS, BEAD_PENALTIES)):
+            pi, pj = i - di, j - dj
+            reachable = (pi >= 0) & (pj >= 0)
+            if not reachable.any():
+                continue
+            pi, pj = np.maximum(pi, 0), np.maximum(pj, 0)
+            l1 = src_len[:, i] - src_len[:, pi]
+            l2 = tgt_len[:, j] - tgt_len[:, pj]
+            candidate = cost[batch, pi, pj] + penalty + length_cost(l1, l2, ratio[:, None])
+            candidate[:, ~reachable] = np.inf
+            better = candidate < best
+            best = np.where(better, candidate, best)
+            move = np.where(better, b, move)
+
+        inside = (
+            (i <= n[:, None])
+            & (j <= m[:, None])
+            & (np.abs(j - i * slope[:, None]) <= width[:, None])
+        )
+        cost[:, i, j] = np.where(inside, best, np.inf)
+        back[:, i, j] = np.where(inside, move, -1)
+
+    results = []
+    retry = []
+    for c in range(count):
+        i, j = int(n[c]), int(m[c])
+        if not np.isfinite(cost[c, i, j]):
+            retry.append(c)
+            results.append(None)
+            continue
+        path = []
+        while i > 0 or j > 0:
+            di, dj, _ = BEADS[back[c, i, j]]
+            path.append((i - di, i, j - dj, j))
+            i, j = i - di, j - dj
+        results.append(path[::-1])
+
+    if retry and band < 1:
+        # The band cut every path to the corner; align these without it
+        for c, path in zip(retry, align_batch([chapters[c] for c in retry], band=1, min_band=max(rows, cols))):
+            results[c] = path
+    return results
+
+
+def plan_batches(lengths, batch_cells=BATCH_CELLS):
+    """
+    Split {key: (source lengths, target lengths)} into batches of keys of
+    similar shape, each within batch_cells DP cells.
+    """
+    keys = sorted(lengths, key=lambda key: (len(lengths[key][0]), len(lengths[key][1])))
+    batches = []
+    batch = []
+    rows = cols = 0  # longest source and target side in the batch
+    for key in keys:
+        src, tgt = lengths[key]
+        if batch and (len(batch) + 1) * (max(rows, len(src)) + 1) * (max(cols, len(tgt)) + 1) > batch_cells:
+            batches.append(batch)
+            batch = []
+            rows = cols = 0
+        batch.append(key)
+        rows, cols = max(rows, len(src)), max(cols, len(tgt))
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def chapter_sort_key(key):
+    book, chapter = key
+    return (
+        BOOK_IDS.get(book, len(BOOK_IDS) + 1),
+        book,
+        int(chapter) if chapter.isdigit() else float("inf"),
+        chapter,
+    )
+
+
+def load_sentences(sentences_dir="Sentences"):
+    """
+    {language: {(book, chapter): [(sentence number, text), ...]}} from the
+    Sentences tables (TSV or Parquet), sentences in chapter order.
+    """
+    sentences = {}
+    for language, path in find_language_files(sentences_dir).items():
+        if path.suffix == PARQUET_SUFFIX:
+            df = read_parquet(path, columns=SENTENCE_COLUMNS).astype(str)
+        else:
+            df = pd.read_csv(path, sep="\t", dtype=str, keep_default_na=False)
+        df = df.assign(order=pd.to_numeric(df["Sentence"], errors="coerce"))
+        df = df.sort_values(["Book", "Chapter", "order"], kind="stable")
+
+        chapters = {}
+        for book, chapter, number, text in zip(df["Book"], df["Chapter"], df["Sentence"], df["Text"]):
+            chapters.setdefault((book, chapter), []).append((number, text))
+        sentences[language] = chapters
+        print(f"Loaded {len(df)} sentences for {language}")
+    return sentences
+
+
+def sentence_ids(sentences, start, end):
+    if start == end:
+        return ""
+    if end - start == 1:
+        return sentences[start][0]
+    return f"{sentences[start][0]}-{sentences[end - 1][0]}"
+
+
+def bead_rows(key, src, tgt, path):
+    rows = []
+    for i0, i1, j0, j1 in path:
+        rows.append([
+            *key,
+            sentence_ids(src, i0, i1),
+            sentence_ids(tgt, j0, j1),
+            " ".join(text for _, text in src[i0:i1]) or NO_SENTENCE,
+            " ".join(text for _, text in tgt[j0:j1]) or NO_SENTENCE,
+        ])
+    return rows
+
+
+def sentence_pool(workers):
+    context = None
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+
+@metrics.stage("sentence_align")
+def create_sentence_corpus(
+    language_pairs=LANGUAGE_PAIRS, sentences_dir="Sentences", output_dir="Sentence_Corpus", workers=None
+):
+    """
+    Sentence pairs for every language pair, aligned chapter by chapter
+    (chapters present in both languages) with Gale-Church. Batches of
+    chapters from all pairs are spread over a process pool.
+    """
+    sentences = load_sentences(sentences_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    jobs = []  # (lang1, lang2, keys of the batch, per-chapter lengths)
+    for lang1, lang2 in language_pairs:
+        if lang1 not in sentences or lang2 not in sentences:
+            print(f"Warning: Missing sentences for {lang1}-{lang2}. Skipping pair.")
+            continue
+        shared = sentences[lang1].keys() & sentences[lang2].keys()
+        lengths = {
+            key: (
+                np.array([len(text) for _, text in sentences[lang1][key]], dtype=np.float64),
+                np.array([len(text) for _, text in sentences[lang2][key]], dtype=np.float64),
+            )
+            for key in shared
+        }
+        for batch in plan_batches(lengths):
+            jobs.append((lang1, lang2, batch, [lengths[key] for key in batch]))
+
+    if workers is None:
+        workers = min(len(jobs), os.cpu_count() or 1)
+    print(f"Aligning sentences in {len(jobs)} batches with {max(workers, 1)} worker{'s' if workers > 1 else ''}")
+
+    paths = {}
+    if workers <= 1:
+        results = (align_batch(batch_lengths) for _, _, _, batch_lengths in jobs)
+        for (lang1, lang2, keys, _), batch_paths in zip(jobs, results):
+            paths.setdefault((lang1, lang2), {}).update(zip(keys, batch_paths))
+    else:
+        with sentence_pool(workers) as executor:
+            futures = [executor.submit(align_batch, batch_lengths) for _, _, _, batch_lengths in jobs]
+            for (lang1, lang2, keys, _), future in zip(jobs, futures):
+                paths.setdefault((lang1, lang2), {}).update(zip(keys, future.result()))
+
+    for (lang1, lang2), pair_paths in paths.items():
+        rows = []
+        for key in sorted(pair_paths, key=chapter_sort_key):
+            path = pair_paths[key]
+            rows.extend(bead_rows(key, sentences[lang1][key], sentences[lang2][key], path))
+            for i0, i1, j0, j1 in path:
+                METRICS.inc("sentence_beads", pair=f"{lang1}-{lang2}", bead=f"{i1 - i0}-{j1 - j0}")
+
+        columns = ["Book", "Chapter", f"{lang1}_Sentence", f"{lang2}_Sentence", lang1, lang2]
+        out_filename = f"{output_dir}/{lang1}_{lang2}_Sentences.tsv"
+        pd.DataFrame(rows, columns=columns).to_csv(out_filename, sep="\t", index=False)
+        METRICS.inc("rows_written", len(rows), table=f"{lang1}-{lang2} sentences")
+        print(f"Saved: {out_filename} ({len(rows)} sentence pairs)")
+
+
+if __name__ == "__main__":
+    create_sentence_corpus()
@@ -0,0 +1,58 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from columnar import ParquetAppender, write_parquet
+from parallel_corpus import find_language_files
+
+COLUMNS = ["Book", "Chapter", "Verse", "English", "Spanish"]
+
+
+class ParquetAppenderTest(unittest.TestCase):
+    def append_all(self, frames):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "pair.parquet"
+            appender = ParquetAppender(path, COLUMNS)
+            for rows in frames:
+                appender.append(pd.DataFrame(rows, columns=COLUMNS))
+            appender.close()
+            return pd.read_parquet(path)
+
+    def test_chapter_dtype_changes_between_frames(self):
+        df = self.append_all([
+            [["Genesis", "1", "1", "a", "b"]],
+            [["Genesis", 2, "1-3", "c", "d"]],
+            [["Psalms", "PROLOGUE", "1", "e", "f"]],
+        ])
+        self.assertEqual(df["Chapter"].tolist(), ["1", "2", "PROLOGUE"])
+        self.assertEqual(df["Verse"].tolist(), ["1", "1-3", "1"])
+
+    def test_empty_frames(self):
+        df = self.append_all([[], [["Genesis", "1", "1", "a", "b"]], []])
+        self.assertEqual(len(df), 1)
+        self.assertEqual(len(self.append_all([])), 0)
+
+
+class FindLanguageFilesTest(unittest.TestCase):
+    def test_newest_table_wins(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            df = pd.DataFrame([["Genesis", "1", "1", "In the beginning"]], columns=["Book", "Chapter", "Verse", "Text"])
+            tsv = Path(tmp) / "English.tsv"
+            parquet = Path(tmp) / "English.parquet"
+            df.to_csv(tsv, sep="\t", index=False)
+            write_parquet(df, parquet, language="English")
+
+            os.utime(tsv, ns=(1_000_000_000, 1_000_000_000))
+            self.assertEqual(find_language_files(tmp), {"English": parquet})
+            os.utime(parquet, ns=(500_000_000, 500_000_000))
+            self.assertEqual(find_language_files(tmp), {"English": tsv})
+
+
+if __name__ == "__main__":
+    unittest.main()
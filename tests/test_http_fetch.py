@@ -0,0 +1,217 @@
+import asyncio
+import json
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import scrape
+from browser_pool import BrowserPool
+from http_fetch import CONTENT_MARKER, extract_chapter, fetch_chapter, make_client
+from manifest import Manifest
+from raw_store import RawStore
+from rate_limit import HostRateLimiter
+
+CHAPTER_MARKUP = (
+    f'<div class="ChapterContent_chapter__uvbXo"><span {CONTENT_MARKER}>'
+    "In the beginning God created the heaven and the earth. "
+    "And the earth was without form, and void.</span></div>"
+)
+
+# Server-rendered: the chapter is in the served markup
+SERVER_RENDERED = f"<!DOCTYPE html><html><head><title>GEN 1</title></head><body>{CHAPTER_MARKUP}</body></html>"
+
+# The chapter only in the renderer's page data
+NEXT_DATA_ONLY = (
+    "<!DOCTYPE html><html><head><title>GEN 2</title></head><body><div id=\"__next\"></div>"
+    '<script id="__NEXT_DATA__" type="application/json">'
+    + json.dumps({"props": {"pageProps": {"chapterInfo": {"reference": "GEN.2", "content": CHAPTER_MARKUP}}}})
+    + "</script></body></html>"
+)
+
+# Neither: an app shell that needs JS to render the chapter
+APP_SHELL = (
+    "<!DOCTYPE html><html><head><title>GEN 3</title></head><body><div id=\"__next\"></div>"
+    '<script src="/_next/static/chunks/main.js"></script></body></html>'
+)
+
+PAGES = {
+    "/bible/1/GEN.1.KJV": SERVER_RENDERED,
+    "/bible/1/GEN.2.KJV": NEXT_DATA_ONLY,
+    "/bible/1/GEN.3.KJV": APP_SHELL,
+}
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        html = PAGES.get(self.path)
+        body = (html or "Not found").encode("utf-8")
+        self.send_response(200 if html is not None else 404)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeBrowser:
+    """
+    Stands in for Chromium in the pool; browser_fetch itself is patched.
+    """
+
+    def is_connected(self):
+        return True
+
+
+class FakeContext:
+    async def close(self):
+        pass
+
+
+class FakePage:
+    def __init__(self, captured=None):
+        self.captured = captured  # what CAPTURE_CHAPTER_JS returns
+
+    def on(self, event, handler):
+        pass
+
+    async def goto(self, url, wait_until=None):
+        return mock.Mock(status=200)
+
+    async def wait_for_selector(self, selector, state=None, timeout=None):
+        pass
+
+    async def evaluate(self, script, arg=None):
+        return self.captured
+
+
+async def new_fake_page(browser):
+    return FakeContext(), FakePage()
+
+
+class HttpFetchTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        host, port = cls.server.server_address
+        cls.base_url = f"http://{host}:{port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.thread.join()
+
+    def setUp(self):
+        patcher = mock.patch.object(scrape, "BASE_URL", self.base_url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        batch = [{"book": "GEN", "lang": "English", "ver": "1", "bible_ver": "KJV", "chapter_length": 3}]
+        self.jobs = list(scrape.iter_chapters(batch))
+
+    def fetch_all(self, urls):
+        async def run():
+            client = make_client("nlp-scraper-test", 4)
+            try:
+                return [await fetch_chapter(client, url) for url in urls]
+            finally:
+                await client.aclose()
+
+        return asyncio.run(run())
+
+    def test_jobs_point_at_base_url(self):
+        self.assertEqual(
+            [job["url"] for job in self.jobs],
+            [self.base_url + path for path in PAGES],
+        )
+
+    def test_extract_chapter(self):
+        self.assertEqual(extract_chapter(SERVER_RENDERED), SERVER_RENDERED)
+        self.assertEqual(extract_chapter(NEXT_DATA_ONLY), CHAPTER_MARKUP)
+        self.assertIsNone(extract_chapter(APP_SHELL))
+
+    def test_fetch_chapter(self):
+        server_rendered, next_data, shell = self.fetch_all([job["url"] for job in self.jobs])
+        self.assertEqual(server_rendered, (200, SERVER_RENDERED))
+        self.assertEqual(next_data, (200, CHAPTER_MARKUP))
+        # A fine response without the chapter: the caller needs a browser
+        self.assertEqual(shell, (200, None))
+
+    def test_fetch_chapter_error_status(self):
+        self.assertEqual(self.fetch_all([self.base_url + "/bible/1/GEN.99.KJV"]), [(404, None)])
+
+    def test_browser_fallback(self):
+        rendered = {}
+
+        async def browser_fetch(page, url, stats):
+            rendered[url] = page
+            return 200, SERVER_RENDERED
+
+        async def run(tmp):
+            client = make_client("nlp-scraper-test", 2)
+            store = RawStore(Path(tmp) / "Raw-Store")
+            manifest = Manifest(str(Path(tmp) / "manifest.sqlite"), store=store)
+            pool = BrowserPool(FakeBrowser(), new_fake_page, size=2)
+            try:
+                with mock.patch.object(scrape, "browser_fetch", browser_fetch):
+                    errors, stats = await scrape.scrape_batch_async(
+                        pool, None, manifest, client, concurrency=2, jobs=self.jobs, limiter=HostRateLimiter(1000, 10)
+                    )
+                return errors, stats, {job["label"]: store.get(job["label"]) for job in self.jobs}
+            finally:
+                await client.aclose()
+                await pool.close()
+                manifest.close()
+                store.close()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            errors, stats, saved = asyncio.run(run(tmp))
+
+        self.assertEqual(errors, [])
+        self.assertEqual(stats.http_fetches, 3)
+        # Only the page with neither the markup nor the page data needs the browser
+        self.assertEqual(list(rendered), [self.jobs[2]["url"]])
+        self.assertEqual(stats.browser_fetches, 1)
+        self.assertEqual(
+            saved,
+            {
+                "GEN.1.KJV.English": SERVER_RENDERED,
+                "GEN.2.KJV.English": CHAPTER_MARKUP,
+                "GEN.3.KJV.English": SERVER_RENDERED,
+            },
+        )
+
+
+class LeanCaptureTest(unittest.TestCase):
+    def capture(self, captured):
+        stats = scrape.ScrapeStats()
+        with mock.patch.object(scrape, "PAGE_PROFILE", "lean"):
+            status, html = asyncio.run(scrape.browser_fetch(FakePage(captured), "http://localhost/GEN.1", stats))
+        return status, html, stats
+
+    def test_bytes_saved_are_utf8_bytes(self):
+        chapter = "<div>Génesis – “En el principio”</div>"
+        status, html, stats = self.capture([chapter, 1000])
+        self.assertEqual((status, html), (200, chapter))
+        self.assertEqual(stats.bytes_saved, [1000 - len(chapter.encode("utf-8"))])
+
+    def test_missing_container_fails_the_fetch(self):
+        status, html, stats = self.capture([None, 0])
+        self.assertEqual((status, html), (200, None))
+        self.assertEqual(stats.bytes_saved, [])
+        job = {"url": "http://localhost/GEN.1"}
+        self.assertIsNotNone(scrape.check_chapter(job, status, html))
+        self.assertTrue(scrape.is_retryable(status))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import metrics
+from metrics import METRICS
+
+
+def series(path):
+    return {line.rsplit(" ", 1)[0] for line in path.read_text().splitlines() if not line.startswith("#")}
+
+
+class StageMetricsTest(unittest.TestCase):
+    def setUp(self):
+        METRICS.reset()
+        metrics.STAGE_METRICS.clear()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        patcher = mock.patch.object(metrics, "METRICS_DIR", self.tmp.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_each_prom_file_holds_only_its_stage(self):
+        for _ in range(2):
+            with metrics.stage("scrape"):
+                METRICS.inc("chapters_saved", 3)
+        with metrics.stage("pipeline"):
+            METRICS.inc("pages_segmented")
+            with metrics.stage("parallel_corpus"):
+                METRICS.inc("rows_written", 7, table="all")
+
+        out = Path(self.tmp.name)
+        files = {name: series(out / f"{name}.prom") for name in ("scrape", "pipeline", "parallel_corpus")}
+        for name, own in files.items():
+            for other, theirs in files.items():
+                if other != name:
+                    self.assertFalse(own & theirs, f"{name} and {other} share {own & theirs}")
+        self.assertIn("nlp_chapters_saved_total 6", (out / "scrape.prom").read_text())
+        self.assertNotIn("rows_written", (out / "pipeline.prom").read_text())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import random
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sentence_align import align_batch, plan_batches
+
+
+def random_lengths(rng, chapters):
+    lengths = {}
+    for c in range(chapters):
+        n = rng.randint(1, 80)
+        m = max(1, n + rng.randint(-10, 10))
+        lengths[("GEN", str(c))] = (np.ones(n), np.ones(m))
+    return lengths
+
+
+class PlanBatchesTest(unittest.TestCase):
+    def test_batches_stay_within_cells(self):
+        rng = random.Random(0)
+        for batch_cells in (500, 5_000, 20_000, 200_000):
+            lengths = random_lengths(rng, 300)
+            batches = plan_batches(lengths, batch_cells)
+            self.assertEqual(sorted(k for batch in batches for k in batch), sorted(lengths))
+            for batch in batches:
+                if len(batch) < 2:
+                    continue  # a chapter bigger than the limit is aligned on its own
+                rows = max(len(lengths[key][0]) for key in batch)
+                cols = max(len(lengths[key][1]) for key in batch)
+                self.assertLessEqual(len(batch) * (rows + 1) * (cols + 1), batch_cells)
+
+    def test_longer_chapter_earlier_in_batch(self):
+        # Sorted by source length, a later chapter can have a shorter target
+        lengths = {
+            ("GEN", "1"): (np.ones(10), np.ones(100)),
+            ("GEN", "2"): (np.ones(11), np.ones(1)),
+            ("GEN", "3"): (np.ones(12), np.ones(1)),
+        }
+        for batch in plan_batches(lengths, 2_500):
+            rows = max(len(lengths[key][0]) for key in batch)
+            cols = max(len(lengths[key][1]) for key in batch)
+            if len(batch) > 1:
+                self.assertLessEqual(len(batch) * (rows + 1) * (cols + 1), 2_500)
+
+
+class AlignBatchTest(unittest.TestCase):
+    def test_equal_lengths_align_one_to_one(self):
+        src = np.array([20.0, 35.0, 50.0])
+        (path,) = align_batch([(src, src.copy())])
+        self.assertEqual(path, [(0, 1, 0, 1), (1, 2, 1, 2), (2, 3, 2, 3)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import csv
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BOOK_NAMES_PATH = Path(__file__).with_name("book-names.tsv")
+
+# A verse key packs (book_id, chapter, verse_start, verse_end) into one
+# int64, 16 bits each, so sorting by key gives canonical biblical order:
+# books in book-names.tsv order, then chapter, then verse.
+FIELD_BITS = 16
+FIELD_MAX = (1 << FIELD_BITS) - 1
+KEY_COLUMNS = ["book_id", "chapter_num", "verse_start", "verse_end"]
+
+# Labels that aren't numbers (a chapter like "intro", a verse like "a")
+# get codes from this offset up, in first-seen order, so they still have a
+# key of their own and sort after the numbered ones.
+OTHER_LABEL_BASE = 1 << (FIELD_BITS - 1)
+
+VERSE_LABEL_RE = r"^\s*(\d+)\s*(?:-\s*(\d+)\s*)?$"
+
+
+def load_book_ids(file_path=BOOK_NAMES_PATH):
+    """
+    Book ids in book-names.tsv order, starting at 1, for both the acronym
+    ("GEN") and the full name ("Genesis").
+    """
+    book_ids = {}
+    with open(file_path, "r", encoding="utf-8") as f:
+        reader = csv.reader(f, delimiter="\t")
+        for row in reader:
+            if len(row) >= 2:
+                book_id = len(book_ids) // 2 + 1
+                book_ids[row[0]] = book_id
+                book_ids[row[1]] = book_id
+    return book_ids
+
+
+BOOK_IDS = load_book_ids()
+_other_books = {}
+_other_labels = {}
+
+
+def _code_for(label, registry, base):
+    """
+    Stable code for a label outside the known set; codes are handed out in
+    first-seen order and kept for the life of the process so keys built
+    from different frames still match.
+    """
+    code = registry.get(label)
+    if code is None:
+        code = registry[label] = base + len(registry)
+        if code > FIELD_MAX:
+            raise ValueError(f"Too many unrecognised labels to encode {label!r}")
+    return code
+
+
+def book_ids(books):
+    """
+    Map a Series of book names or acronyms to ids. Books missing from
+    book-names.tsv sort after Revelation.
+    """
+    first_other = max(BOOK_IDS.values(), default=0) + 1
+    ids = books.map(BOOK_IDS)
+    unknown = ids.isna()
+    if unknown.any():
+        ids[unknown] = books[unknown].map(
+            lambda b: _code_for(b, _other_books, first_other)
+        )
+    return ids.astype("int64")
+
+
+def chapter_nums(chapters):
+    nums = pd.to_numeric(chapters, errors="coerce")
+    odd = nums.isna() | (nums < 0) | (nums >= OTHER_LABEL_BASE) | (nums % 1 != 0)
+    if odd.any():
+        nums = nums.astype("float64")
+        nums[odd] = chapters[odd].map(
+            lambda c: _code_for(str(c), _other_labels, OTHER_LABEL_BASE)
+        )
+    return nums.astype("int64")
+
+
+def verse_bounds_columns(verses):
+    """
+    verse_start and verse_end for a Series of verse labels: "4" -> (4, 4),
+    "1-4" -> (1, 4). Labels parse_verse_range can't read (including
+    backwards ranges) get verse_start 0 and a code of their own as
+    verse_end, so they sort before verse 1 of their chapter.
+    """
+    labels = verses.astype(str)
+    unique_labels = labels.unique()
+    parts = pd.Series(unique_labels).str.extract(VERSE_LABEL_RE)
+    start = pd.to_numeric(parts[0], errors="coerce")
+    end = pd.to_numeric(parts[1], errors="coerce").fillna(start)
+
+    odd = start.isna() | (end < start) | (end >= OTHER_LABEL_BASE)
+    start = start.where(~odd, 0)
+    end = end.where(~odd, [
+        _code_for(label, _other_labels, OTHER_LABEL_BASE) if is_odd else 0
+        for label, is_odd in zip(unique_labels, odd)
+    ])
+
+    bounds = pd.DataFrame(
+        {"verse_start": start.astype("int64").values, "verse_end": end.astype("int64").values},
+        index=unique_labels,
+    )
+    return bounds.reindex(labels.values).set_axis(verses.index)
+
+
+def pack_keys(book_id, chapter_num, verse_start, verse_end):
+    """
+    One int64 per verse; works on scalars, numpy arrays and Series alike.
+    """
+    book_id = np.asarray(book_id, dtype=np.int64)
+    if (book_id > FIELD_MAX // 2).any():
+        raise ValueError("book id does not fit in a verse key")
+    return (
+        (book_id << (3 * FIELD_BITS))
+        | (np.asarray(chapter_num, dtype=np.int64) << (2 * FIELD_BITS))
+        | (np.asarray(verse_start, dtype=np.int64) << FIELD_BITS)
+        | np.asarray(verse_end, dtype=np.int64)
+    )
+
+
+def chapter_of(keys):
+    """
+    The (book_id, chapter_num) part of verse keys, as one int64.
+    """
+    return np.asarray(keys, dtype=np.int64) >> (2 * FIELD_BITS)
+
+
+def add_verse_keys(df):
+    """
+    Copy of a Verses frame (Book, Chapter, Verse, text) with the integer
+    key columns and the packed int64 "key" added.
+    """
+    keyed = df.copy()
+    keyed["book_id"] = book_ids(df["Book"])
+    keyed["chapter_num"] = chapter_nums(df["Chapter"])
+    bounds = verse_bounds_columns(df["Verse"])
+    keyed["verse_start"] = bounds["verse_start"]
+    keyed["verse_end"] = bounds["verse_end"]
+    keyed["key"] = pack_keys(*(keyed[col] for col in KEY_COLUMNS))
+    return keyed
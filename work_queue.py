@@ -0,0 +1,201 @@
+import sqlite3
+import time
+from contextlib import contextmanager
+
+WORK_QUEUE_PATH = "scrape-queue.sqlite"
+LEASE_SECONDS = 300  # a leased chapter goes back to the queue after this long
+MAX_FAILURES = 3  # retryable failures before a job is marked failed for this run
+
+
+class WorkQueue:
+    """
+    Shared queue of chapter jobs that any number of scraper processes pull
+    from: on one machine, or on several sharing the file over a network
+    filesystem whose POSIX locks work (NFS with lockd, not SMB defaults).
+
+    Workers lease jobs for LEASE_SECONDS; a job whose lease runs out before
+    it is completed or failed, e.g. because its worker crashed, is handed
+    out again. Leasing runs in an IMMEDIATE transaction so two workers can
+    never take the same pending job.
+
+    A retryable failure goes back to the queue up to MAX_FAILURES times.
+    Jobs that end up failed are queued again by the next enqueue(), so a
+    rerun retries them the way the manifest does for the other modes.
+
+    Only the queue is shared. The manifest and the Raw-Store stay WAL
+    SQLite files on each host's local disk, so every host records and
+    keeps just the chapters it fetched itself. Copy them to one machine
+    before segmenting.
+    """
+
+    def __init__(self, path=WORK_QUEUE_PATH, lease_seconds=LEASE_SECONDS, max_failures=MAX_FAILURES):
+        self.lease_seconds = lease_seconds
+        self.max_failures = max_failures
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        # Not WAL: its shared-memory index only works when every process is
+        # on the same machine. The rollback journal relies on file locks
+        # alone, so the queue also works on a shared network filesystem.
+        self.conn.execute("PRAGMA journal_mode=DELETE")
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY,
+                url TEXT NOT NULL UNIQUE,
+                label TEXT NOT NULL,
+                save_dir TEXT NOT NULL,
+                save_path TEXT NOT NULL,
+                batch INTEGER,
+                state TEXT NOT NULL DEFAULT 'pending',
+                worker TEXT,
+                lease_expires REAL,
+                leases INTEGER NOT NULL DEFAULT 0,
+                failures INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                updated_at REAL
+            )
+            """
+        )
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(jobs)")}
+        if "failures" not in columns:
+            # Queue files created before failures were counted
+            self.conn.execute("ALTER TABLE jobs ADD COLUMN failures INTEGER NOT NULL DEFAULT 0")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, id)")
+
+    @contextmanager
+    def transaction(self):
+        # The connection is in autocommit mode; IMMEDIATE takes the write
+        # lock up front so concurrent workers queue up instead of failing.
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.conn
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def enqueue(self, jobs, batch=None):
+        """
+        Add jobs that aren't queued yet and put failed ones back in the
+        queue; returns how many were added or requeued. Safe to call from
+        every worker at startup (a worker joining a running queue gives
+        its failed jobs one more round).
+        """
+        now = time.time()
+        with self.transaction():
+            before = self.conn.total_changes
+            self.conn.executemany(
+                """
+                INSERT INTO jobs (url, label, save_dir, save_path, batch, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    state = 'pending', failures = 0, error = NULL, updated_at = excluded.updated_at
+                WHERE jobs.state = 'failed'
+                """,
+                [
+                    (job["url"], job["label"], job["save_dir"], job["save_path"], batch, now)
+                    for job in jobs
+                ],
+            )
+            return self.conn.total_changes - before
+
+    def requeue_expired(self):
+        """
+        Return jobs whose lease has run out to the queue.
+        """
+        with self.transaction():
+            return self._requeue_expired(time.time())
+
+    def _requeue_expired(self, now):
+        cur = self.conn.execute(
+            """
+            UPDATE jobs SET state = 'pending', worker = NULL, lease_expires = NULL
+            WHERE state = 'leased' AND lease_expires < ?
+            """,
+            (now,),
+        )
+        return cur.rowcount
+
+    def lease(self, worker, n=1):
+        """
+        Lease up to n pending jobs (oldest first) to `worker`.
+        """
+        now = time.time()
+        with self.transaction():
+            self._requeue_expired(now)
+            rows = self.conn.execute(
+                "SELECT * FROM jobs WHERE state = 'pending' ORDER BY id LIMIT ?", (n,)
+            ).fetchall()
+            self.conn.executemany(
+                """
+                UPDATE jobs SET state = 'leased', worker = ?, lease_expires = ?,
+                    leases = leases + 1, updated_at = ?
+                WHERE id = ?
+                """,
+                [(worker, now + self.lease_seconds, now, row["id"]) for row in rows],
+            )
+        return [
+            {key: row[key] for key in ("url", "label", "save_dir", "save_path")}
+            for row in rows
+        ]
+
+    def renew(self, job, worker):
+        """
+        Extend a lease this worker still holds; False if it has lapsed.
+        """
+        with self.transaction():
+            cur = self.conn.execute(
+                """
+                UPDATE jobs SET lease_expires = ?
+                WHERE url = ? AND worker = ? AND state = 'leased'
+                """,
+                (time.time() + self.lease_seconds, job["url"], worker),
+            )
+        return cur.rowcount == 1
+
+    def complete(self, job):
+        # Work finished after the lease lapsed still counts
+        with self.transaction():
+            self.conn.execute(
+                """
+                UPDATE jobs SET state = 'done', worker = NULL, lease_expires = NULL,
+                    error = NULL, updated_at = ?
+                WHERE url = ?
+                """,
+                (time.time(), job["url"]),
+            )
+
+    def fail(self, job, error=None, retry=False):
+        """
+        Record a failed job. With retry=True (a throttled, timed-out or
+        truncated fetch) it goes back in the queue unless it has already
+        failed max_failures times.
+        """
+        with self.transaction():
+            self.conn.execute(
+                """
+                UPDATE jobs SET
+                    state = CASE WHEN ? AND failures + 1 < ? THEN 'pending' ELSE 'failed' END,
+                    failures = failures + 1,
+                    worker = NULL, lease_expires = NULL, error = ?, updated_at = ?
+                WHERE url = ?
+                """,
+                (retry, self.max_failures, error, time.time(), job["url"]),
+            )
+
+    def outstanding(self):
+        """
+        Jobs still pending or leased.
+        """
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE state IN ('pending', 'leased')"
+        ).fetchone()[0]
+
+    def counts(self):
+        return dict(
+            self.conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        )
+
+    def close(self):
+        self.conn.close()